@@ -33,8 +33,13 @@ def main():
     parser.add_argument(
         '--model_path', type=str, default=None, help='[Option] Model path. Usually, you do not need to specify it')
     parser.add_argument('--suffix', type=str, default='out', help='Suffix of the restored image')
-    parser.add_argument('-t', '--tile', type=int, default=0, help='Tile size, 0 for no tile during testing')
+    parser.add_argument(
+        '-t', '--tile', type=int, default=0, help='Tile size, 0 for no tile, -1 to pick it from the available memory')
     parser.add_argument('--tile_pad', type=int, default=10, help='Tile padding')
+    parser.add_argument(
+        '--tile_blend',
+        action='store_true',
+        help='Blend overlapping tiles instead of pasting them, allows a smaller --tile_pad')
     parser.add_argument('--pre_pad', type=int, default=0, help='Pre padding size at each border')
     parser.add_argument('--face_enhance', action='store_true', help='Use GFPGAN to enhance face')
     parser.add_argument(
@@ -111,6 +116,7 @@ def main():
         model=model,
         tile=args.tile,
         tile_pad=args.tile_pad,
+        tile_blend=args.tile_blend,
         pre_pad=args.pre_pad,
         half=not args.fp32,
         gpu_id=args.gpu_id)
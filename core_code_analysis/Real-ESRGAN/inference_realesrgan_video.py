@@ -225,6 +225,7 @@ def inference_video(args, video_save_path, device=None, total_workers=1, worker_
         model=model,
         tile=args.tile,
         tile_pad=args.tile_pad,
+        tile_blend=args.tile_blend,
         pre_pad=args.pre_pad,
         half=not args.fp32,
         device=device,
@@ -251,26 +252,58 @@ def inference_video(args, video_save_path, device=None, total_workers=1, worker_
     height, width = reader.get_resolution()
     fps = reader.get_fps()
     writer = Writer(args, audio, height, width, video_save_path, fps)
+    out_size = (int(width * args.outscale), int(height * args.outscale))
+
+    if args.face_enhance or args.tile != 0:
+        batch_size = 1
+    elif args.batch_size > 0:
+        batch_size = args.batch_size
+    else:
+        batch_size = upsampler.get_batch_size(height, width)
 
     pbar = tqdm(total=len(reader), unit='frame', desc='inference')
+    imgs = []
     while True:
         img = reader.get_frame()
-        if img is None:
+        if img is not None:
+            imgs.append(img)
+            if len(imgs) < batch_size:
+                continue
+        if len(imgs) == 0:
             break
 
         try:
             if args.face_enhance:
-                _, _, output = face_enhancer.enhance(img, has_aligned=False, only_center_face=False, paste_back=True)
+                _, _, output = face_enhancer.enhance(
+                    imgs[0], has_aligned=False, only_center_face=False, paste_back=True)
+                outputs = [output]
             else:
-                output, _ = upsampler.enhance(img, outscale=args.outscale)
+                outputs = [output for output, _ in upsampler.enhance_batch(imgs, outscale=args.outscale)]
         except RuntimeError as error:
             print('Error', error)
-            print('If you encounter CUDA out of memory, try to set --tile with a smaller number.')
-        else:
+            print('If you encounter CUDA out of memory, try to set --tile or --batch_size with a smaller number.')
+            # do not drop frames, the video would get out of sync with the audio: retry a failed batch frame by
+            # frame and write the frames which fail again resized
+            torch.cuda.empty_cache()
+            outputs = []
+            for frame in imgs:
+                output = None
+                if len(imgs) > 1:
+                    try:
+                        output, _ = upsampler.enhance(frame, outscale=args.outscale)
+                    except RuntimeError as frame_error:
+                        print('Error', frame_error)
+                if output is None:
+                    output = cv2.resize(frame, out_size, interpolation=cv2.INTER_LANCZOS4)
+                outputs.append(output)
+        for output in outputs:
             writer.write_frame(output)
 
         torch.cuda.synchronize(device)
-        pbar.update(1)
+        pbar.update(len(imgs))
+        imgs = []
+        if img is None:
+            break
 
     reader.close()
     writer.close()
@@ -348,9 +381,16 @@ def main():
               'Only used for the realesr-general-x4v3 model'))
     parser.add_argument('-s', '--outscale', type=float, default=4, help='The final upsampling scale of the image')
     parser.add_argument('--suffix', type=str, default='out', help='Suffix of the restored video')
-    parser.add_argument('-t', '--tile', type=int, default=0, help='Tile size, 0 for no tile during testing')
+    parser.add_argument(
+        '-t', '--tile', type=int, default=0, help='Tile size, 0 for no tile, -1 to pick it from the available memory')
     parser.add_argument('--tile_pad', type=int, default=10, help='Tile padding')
+    parser.add_argument(
+        '--tile_blend',
+        action='store_true',
+        help='Blend overlapping tiles instead of pasting them, allows a smaller --tile_pad')
     parser.add_argument('--pre_pad', type=int, default=0, help='Pre padding size at each border')
+    parser.add_argument(
+        '--batch_size', type=int, default=0, help='Frames per forward pass, 0 for choosing it from available memory')
     parser.add_argument('--face_enhance', action='store_true', help='Use GFPGAN to enhance face')
     parser.add_argument(
         '--fp32', action='store_true', help='Use fp32 precision during inference. Default: fp16 (half precision).')
@@ -5,11 +5,62 @@ import os
 import queue
 import threading
 import torch
+from concurrent.futures import ThreadPoolExecutor
 from basicsr.utils.download_util import load_file_from_url
 from torch.nn import functional as F
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Rough number of feature channels kept alive per output pixel during inference (e.g. the 64-channel conv_hr
+# activations of RRDBNet together with its input), used to estimate the memory footprint of a batch.
+ACTIVATION_CHANNELS = 128
+
+# Bounds of the tile size picked from the available memory, and its fallback if the memory cannot be queried
+MIN_TILE_SIZE = 32
+MAX_TILE_SIZE = 1024
+DEFAULT_TILE_SIZE = 256
+
+# Messages of out of memory errors raised as plain RuntimeError: CUDA (older PyTorch versions) and the CPU allocator,
+# which has no dedicated exception type
+OUT_OF_MEMORY_MESSAGES = ('out of memory', 'not enough memory', "can't allocate memory")
+
+
+def is_out_of_memory(error):
+    """Check whether an exception raised during inference means that the device ran out of memory.
+
+    Args:
+        error (Exception): The raised exception.
+
+    Returns:
+        bool: True for CUDA and CPU out of memory errors.
+    """
+    if isinstance(error, MemoryError):
+        return True
+    for error_type in (getattr(torch, 'OutOfMemoryError', None), getattr(torch.cuda, 'OutOfMemoryError', None)):
+        if error_type is not None and isinstance(error, error_type):
+            return True
+    message = str(error).lower()
+    return any(oom_message in message for oom_message in OUT_OF_MEMORY_MESSAGES)
+
+
+def get_available_memory(device):
+    """Get the free memory in bytes of the given device.
+
+    Args:
+        device (torch.device | str): The device to query.
+
+    Returns:
+        int | None: Free memory in bytes, or None if it cannot be determined.
+    """
+    device = torch.device(device)
+    if device.type == 'cuda':
+        free, _ = torch.cuda.mem_get_info(device)
+        return free
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
 
 class RealESRGANer():
     """A helper class for upsampling images with RealESRGAN.
@@ -20,10 +71,24 @@ class RealESRGANer():
         model (nn.Module): The defined network. Default: None.
         tile (int): As too large images result in the out of GPU memory issue, so this tile option will first crop
             input images into tiles, and then process each of them. Finally, they will be merged into one image.
-            0 denotes for do not use tile. Default: 0.
+            0 denotes for do not use tile, negative values pick the tile size from the available memory. Default: 0.
         tile_pad (int): The pad size for each tile, to remove border artifacts. Default: 10.
         pre_pad (int): Pad the input images to avoid border artifacts. Default: 10.
         half (float): Whether to use half precision during inference. Default: False.
+        autocast_dtype (torch.dtype): Run the model under ``torch.autocast`` with this dtype, e.g. ``torch.bfloat16``
+            on CPUs with native bf16 support. None for no autocast. Default: None.
+        channels_last (bool): Use the channels_last memory format for the model and its inputs, which lets oneDNN
+            pick faster convolution kernels on CPU. Default: False.
+        tile_batch_size (int): Number of tiles stacked into one forward pass. Default: 1.
+        tile_workers (int): Number of threads running tile forward passes concurrently. On CPU the torch intra-op
+            threads (``torch.get_num_threads()``) are split between them while the tiles are processed. Default: 1.
+        tile_blend (bool): Blend the overlapping tile outputs with a feathered weight window instead of pasting the
+            tile centres, which hides seams with a much smaller ``tile_pad``. Default: False.
+
+    :meth:`enhance`, :meth:`enhance_batch` and :meth:`upsample` keep no per-call state on the instance, so one
+    instance can be shared between threads (see :class:`RealESRGANerPool`). The step-wise ``pre_process``,
+    ``process``/``tile_process`` and ``post_process`` methods store intermediate tensors on the instance and are
+    not thread-safe.
     """
 
     def __init__(self,
@@ -36,13 +101,25 @@ class RealESRGANer():
                  pre_pad=10,
                  half=False,
                  device=None,
-                 gpu_id=None):
+                 gpu_id=None,
+                 autocast_dtype=None,
+                 channels_last=False,
+                 tile_batch_size=1,
+                 tile_workers=1,
+                 tile_blend=False):
         self.scale = scale
         self.tile_size = tile
         self.tile_pad = tile_pad
+        self.tile_batch_size = max(1, tile_batch_size)
+        self.tile_workers = max(1, tile_workers)
+        self.tile_blend = tile_blend
         self.pre_pad = pre_pad
         self.mod_scale = None
         self.half = half
+        self.autocast_dtype = autocast_dtype
+        self.channels_last = channels_last
+        # reusable per-thread input buffers of the fused 8-bit path, see bgr_to_tensor
+        self._buffers = threading.local()
 
         # initialize model
         if gpu_id:
@@ -73,6 +150,8 @@ class RealESRGANer():
         self.model = model.to(self.device)
         if self.half:
             self.model = self.model.half()
+        if self.channels_last:
+            self.model = self.model.to(memory_format=torch.channels_last)
 
     def dni(self, net_a, net_b, dni_weight, key='params', loc='cpu'):
         """Deep network interpolation.
@@ -85,114 +164,400 @@ class RealESRGANer():
             net_a[key][k] = dni_weight[0] * v_a + dni_weight[1] * net_b[key][k]
         return net_a
 
-    def pre_process(self, img):
-        """Pre-process, such as pre-pad and mod pad, so that the images can be divisible
+    def get_mod_scale(self):
+        """Get the factor the input size has to be divisible by, None if there is no constraint."""
+        if self.scale == 2:
+            return 2
+        elif self.scale == 1:
+            return 4
+        return None
+
+    def pad_input(self, img, mod_scale=None):
+        """Convert images to a padded NCHW tensor, such as pre-pad and mod pad, so that the images can be divisible.
+
+        It does not modify the instance, so it can be called from several threads at once.
+
+        Args:
+            img (ndarray): A single HWC image or a batch of NHWC images with the same size.
+            mod_scale (int): The input size is padded to be divisible by it. None for no mod pad. Default: None.
+
+        Returns:
+            tuple: The padded tensor and the mod pad as (mod_pad_h, mod_pad_w).
         """
-        img = torch.from_numpy(np.transpose(img, (2, 0, 1))).float()
-        self.img = img.unsqueeze(0).to(self.device)
+        if img.ndim == 3:
+            img = img[np.newaxis]
+        tensor = torch.from_numpy(np.transpose(img, (0, 3, 1, 2))).float().to(self.device)
         if self.half:
-            self.img = self.img.half()
+            tensor = tensor.half()
+        return self.pad_tensor(tensor, mod_scale)
 
+    def pad_tensor(self, tensor, mod_scale=None):
+        """Pre-pad and mod pad an NCHW tensor, see :meth:`pad_input`."""
         # pre_pad
         if self.pre_pad != 0:
-            self.img = F.pad(self.img, (0, self.pre_pad, 0, self.pre_pad), 'reflect')
+            tensor = F.pad(tensor, (0, self.pre_pad, 0, self.pre_pad), 'reflect')
         # mod pad for divisible borders
-        if self.scale == 2:
-            self.mod_scale = 2
-        elif self.scale == 1:
-            self.mod_scale = 4
-        if self.mod_scale is not None:
-            self.mod_pad_h, self.mod_pad_w = 0, 0
-            _, _, h, w = self.img.size()
-            if (h % self.mod_scale != 0):
-                self.mod_pad_h = (self.mod_scale - h % self.mod_scale)
-            if (w % self.mod_scale != 0):
-                self.mod_pad_w = (self.mod_scale - w % self.mod_scale)
-            self.img = F.pad(self.img, (0, self.mod_pad_w, 0, self.mod_pad_h), 'reflect')
+        mod_pad_h, mod_pad_w = 0, 0
+        if mod_scale is not None:
+            _, _, h, w = tensor.size()
+            if (h % mod_scale != 0):
+                mod_pad_h = (mod_scale - h % mod_scale)
+            if (w % mod_scale != 0):
+                mod_pad_w = (mod_scale - w % mod_scale)
+            tensor = F.pad(tensor, (0, mod_pad_w, 0, mod_pad_h), 'reflect')
+        return tensor, (mod_pad_h, mod_pad_w)
+
+    def get_buffer(self, name, shape, dtype, device):
+        """Get a reusable buffer of the calling thread, reallocated only when its shape, dtype or device changes.
+
+        Host buffers are pinned when the model runs on CUDA, so that uploads can be asynchronous.
+        """
+        buffer = getattr(self._buffers, name, None)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype or buffer.device != device:
+            pin_memory = device.type == 'cpu' and torch.device(self.device).type == 'cuda'
+            buffer = torch.empty(shape, dtype=dtype, device=device, pin_memory=pin_memory)
+            setattr(self._buffers, name, buffer)
+        return buffer
+
+    def bgr_to_tensor(self, imgs):
+        """Convert 8-bit BGR images to a normalized RGB NCHW tensor.
+
+        Normalization, BGR -> RGB and HWC -> CHW are fused into one strided copy per channel into a reusable buffer,
+        instead of allocating a full-resolution copy per step. On CUDA the uint8 images are staged in a pinned buffer
+        and uploaded before the conversion, which moves a quarter of the bytes of a float upload.
+
+        Args:
+            imgs (list[ndarray]): uint8 BGR images (HWC) with the same size.
+
+        Returns:
+            Tensor: The NCHW tensor in [0, 1]. It is reused by the next call from the same thread.
+        """
+        device = torch.device(self.device)
+        h, w = imgs[0].shape[0:2]
+        srcs = [torch.from_numpy(np.ascontiguousarray(img)) for img in imgs]
+        if device.type == 'cuda':
+            staging = self.get_buffer('staging', (len(imgs), h, w, 3), torch.uint8, torch.device('cpu'))
+            for idx, src in enumerate(srcs):
+                staging[idx].copy_(src)
+            srcs = staging.to(device, non_blocking=True)
+
+        dtype = torch.float16 if self.half else torch.float32
+        tensor = self.get_buffer('input', (len(imgs), 3, h, w), dtype, device)
+        for idx in range(len(imgs)):
+            for c in range(3):
+                tensor[idx, c].copy_(srcs[idx][:, :, 2 - c])
+        return tensor.mul_(1 / 255.)
+
+    def tensor_to_bgr(self, output):
+        """Convert an RGB NCHW output tensor in [0, 1] to 8-bit BGR images, the reverse of :meth:`bgr_to_tensor`.
+
+        Clamping and scaling are done in place. On CPU the channels are copied straight into the returned array; on
+        CUDA the conversion runs on the device and only the uint8 result is downloaded.
+
+        Args:
+            output (Tensor): The NCHW output tensor. It is modified in place.
+
+        Returns:
+            ndarray: The uint8 BGR images as an NHWC array.
+        """
+        output = output.float().clamp_(0, 1).mul_(255.).round_()
+        if output.device.type != 'cpu':
+            return output.flip(1).permute(0, 2, 3, 1).to(torch.uint8).cpu().numpy()
+        n, _, h, w = output.shape
+        result = np.empty((n, h, w, 3), dtype=np.uint8)
+        dst = torch.from_numpy(result)
+        for c in range(3):
+            dst[..., c].copy_(output[:, 2 - c])
+        return result
+
+    @torch.no_grad()
+    def upsample_bgr(self, imgs):
+        """Upsample 8-bit BGR images with fused pre/post-processing.
+
+        Apart from the network itself, only the returned images are allocated per call.
+
+        Args:
+            imgs (list[ndarray]): uint8 BGR images (HWC) with the same size.
+
+        Returns:
+            ndarray: The upsampled uint8 BGR images as an NHWC array.
+        """
+        tensor, mod_pad = self.pad_tensor(self.bgr_to_tensor(imgs), self.get_mod_scale())
+        if self.tile_size != 0:
+            output = self.tile_forward(tensor)
+        else:
+            output = self.model_forward(tensor)
+        return self.tensor_to_bgr(self.crop_output(output, mod_pad))
+
+    def pre_process(self, img):
+        """Pre-process, such as pre-pad and mod pad, so that the images can be divisible
+
+        Args:
+            img (ndarray): A single HWC image or a batch of NHWC images with the same size.
+        """
+        mod_scale = self.get_mod_scale()
+        if mod_scale is not None:
+            self.mod_scale = mod_scale
+        self.img, (self.mod_pad_h, self.mod_pad_w) = self.pad_input(img, self.mod_scale)
+
+    @torch.no_grad()
+    def model_forward(self, img):
+        """Run the model on a padded NCHW tensor and return the output tensor."""
+        if self.channels_last:
+            img = img.contiguous(memory_format=torch.channels_last)
+        if self.autocast_dtype is None:
+            return self.model(img)
+        with torch.autocast(device_type=torch.device(self.device).type, dtype=self.autocast_dtype):
+            return self.model(img).float()
 
     def process(self):
         # model inference
-        self.output = self.model(self.img)
+        self.output = self.model_forward(self.img)
 
-    def tile_process(self):
+    def get_tile_size(self, batch=1, memory_fraction=0.5):
+        """Pick the tile size from the available memory.
+
+        Args:
+            batch (int): Number of images processed together. Default: 1.
+            memory_fraction (float): Fraction of the free memory that may be used. Default: 0.5.
+
+        Returns:
+            int: The tile size (without padding).
+        """
+        available = get_available_memory(self.device)
+        if available is None:
+            return DEFAULT_TILE_SIZE
+        bytes_per_element = 2 if self.half else 4
+        per_pixel = self.scale**2 * ACTIVATION_CHANNELS * bytes_per_element
+        tiles_in_flight = batch * self.tile_batch_size * self.tile_workers
+        window = int(math.sqrt(available * memory_fraction / (per_pixel * tiles_in_flight)))
+        return max(MIN_TILE_SIZE, min(MAX_TILE_SIZE, window - 2 * self.tile_pad))
+
+    def get_tiles(self, height, width, tile_size):
+        """Split an image into tiles whose padded windows all have the same size, so that they can be batched.
+
+        Windows at the image border are shifted inwards instead of being clipped.
+
+        Args:
+            height (int): Height of the input image.
+            width (int): Width of the input image.
+            tile_size (int): Size of the tile area without padding.
+
+        Returns:
+            list[tuple]: ((y0, y1, x0, x1) of the padded window, (y0, y1, x0, x1) of the tile) for each tile.
+        """
+        window_h = min(tile_size + 2 * self.tile_pad, height)
+        window_w = min(tile_size + 2 * self.tile_pad, width)
+        tiles = []
+        for y in range(0, height, tile_size):
+            for x in range(0, width, tile_size):
+                tile = (y, min(y + tile_size, height), x, min(x + tile_size, width))
+                window_y = min(max(y - self.tile_pad, 0), height - window_h)
+                window_x = min(max(x - self.tile_pad, 0), width - window_w)
+                window = (window_y, window_y + window_h, window_x, window_x + window_w)
+                tiles.append((window, tile))
+        return tiles
+
+    @torch.no_grad()
+    def tile_forward(self, img, tile_size=None):
         """It will first crop input images to tiles, and then process each tile.
         Finally, all the processed tiles are merged into one images.
 
+        ``tile_batch_size`` tiles are stacked per forward pass and, with ``tile_workers`` > 1, the forward passes are
+        dispatched to a thread pool. If the device runs out of memory, the tiles are split in half and the image is
+        processed again, down to ``MIN_TILE_SIZE``.
+
         Modified from: https://github.com/ata4/esrgan-launcher
+
+        Args:
+            img (Tensor): The padded NCHW input tensor.
+            tile_size (int): Size of the tiles. None uses ``self.tile_size``, negative values pick it from the
+                available memory. Default: None.
+
+        Returns:
+            Tensor: The upsampled NCHW output tensor.
         """
-        batch, channel, height, width = self.img.shape
-        output_height = height * self.scale
-        output_width = width * self.scale
-        output_shape = (batch, channel, output_height, output_width)
-
-        # start with black image
-        self.output = self.img.new_zeros(output_shape)
-        tiles_x = math.ceil(width / self.tile_size)
-        tiles_y = math.ceil(height / self.tile_size)
-
-        # loop over all tiles
-        for y in range(tiles_y):
-            for x in range(tiles_x):
-                # extract tile from input image
-                ofs_x = x * self.tile_size
-                ofs_y = y * self.tile_size
-                # input tile area on total image
-                input_start_x = ofs_x
-                input_end_x = min(ofs_x + self.tile_size, width)
-                input_start_y = ofs_y
-                input_end_y = min(ofs_y + self.tile_size, height)
-
-                # input tile area on total image with padding
-                input_start_x_pad = max(input_start_x - self.tile_pad, 0)
-                input_end_x_pad = min(input_end_x + self.tile_pad, width)
-                input_start_y_pad = max(input_start_y - self.tile_pad, 0)
-                input_end_y_pad = min(input_end_y + self.tile_pad, height)
-
-                # input tile dimensions
-                input_tile_width = input_end_x - input_start_x
-                input_tile_height = input_end_y - input_start_y
-                tile_idx = y * tiles_x + x + 1
-                input_tile = self.img[:, :, input_start_y_pad:input_end_y_pad, input_start_x_pad:input_end_x_pad]
-
-                # upscale tile
-                try:
-                    with torch.no_grad():
-                        output_tile = self.model(input_tile)
-                except RuntimeError as error:
-                    print('Error', error)
-                print(f'\tTile {tile_idx}/{tiles_x * tiles_y}')
-
-                # output tile area on total image
-                output_start_x = input_start_x * self.scale
-                output_end_x = input_end_x * self.scale
-                output_start_y = input_start_y * self.scale
-                output_end_y = input_end_y * self.scale
-
-                # output tile area without padding
-                output_start_x_tile = (input_start_x - input_start_x_pad) * self.scale
-                output_end_x_tile = output_start_x_tile + input_tile_width * self.scale
-                output_start_y_tile = (input_start_y - input_start_y_pad) * self.scale
-                output_end_y_tile = output_start_y_tile + input_tile_height * self.scale
-
-                # put tile into output image
-                self.output[:, :, output_start_y:output_end_y,
-                            output_start_x:output_end_x] = output_tile[:, :, output_start_y_tile:output_end_y_tile,
-                                                                       output_start_x_tile:output_end_x_tile]
+        tile_size = self.tile_size if tile_size is None else tile_size
+        if tile_size < 0:
+            tile_size = self.get_tile_size(img.shape[0])
 
-    def post_process(self):
+        while True:
+            try:
+                return self.forward_tiles(img, tile_size)
+            except (RuntimeError, MemoryError) as error:
+                if not is_out_of_memory(error) or tile_size // 2 < MIN_TILE_SIZE:
+                    raise
+                tile_size //= 2
+                if torch.device(self.device).type == 'cuda':
+                    torch.cuda.empty_cache()
+                print(f'\tOut of memory, retrying with tile size {tile_size}')
+
+    def forward_tiles(self, img, tile_size):
+        """Upsample all tiles of an image with the given tile size, see :meth:`tile_forward`."""
+        batch, channel, height, width = img.shape
+        output_shape = (batch, channel, height * self.scale, width * self.scale)
+
+        tiles = self.get_tiles(height, width, tile_size)
+        chunks = [tiles[i:i + self.tile_batch_size] for i in range(0, len(tiles), self.tile_batch_size)]
+
+        if self.tile_blend:
+            # accumulate weighted tiles and their weights, then normalize
+            output = img.new_zeros(output_shape, dtype=torch.float32)
+            weights = img.new_zeros((1, 1) + output_shape[2:], dtype=torch.float32)
+            wy0, wy1, wx0, wx1 = tiles[0][0]
+            feather = self.get_feather((wy1 - wy0) * self.scale, (wx1 - wx0) * self.scale, img.device)
+
+            def merge(chunk, output_tiles):
+                self.blend_tiles(output, weights, feather, chunk, output_tiles)
+        else:
+            # start with black image
+            output = img.new_zeros(output_shape)
+
+            def merge(chunk, output_tiles):
+                self.paste_tiles(output, chunk, output_tiles)
+
+        def run_chunk(chunk):
+            input_tiles = torch.cat([img[:, :, wy0:wy1, wx0:wx1] for (wy0, wy1, wx0, wx1), _ in chunk])
+            return self.model_forward(input_tiles)
+
+        if self.tile_workers > 1 and len(chunks) > 1:
+            # every forward pass would use all intra-op threads, split them between the workers on CPU
+            num_threads = torch.get_num_threads()
+            worker_threads = num_threads
+            if img.device.type == 'cpu':
+                worker_threads = max(1, num_threads // self.tile_workers)
+
+            def run_worker_chunk(chunk):
+                if torch.get_num_threads() != worker_threads:
+                    torch.set_num_threads(worker_threads)
+                return run_chunk(chunk)
+
+            try:
+                with ThreadPoolExecutor(max_workers=self.tile_workers) as executor:
+                    outputs = executor.map(run_worker_chunk, chunks)
+                    for chunk, output_tiles in zip(chunks, outputs):
+                        merge(chunk, output_tiles)
+            finally:
+                torch.set_num_threads(num_threads)
+        else:
+            for chunk in chunks:
+                merge(chunk, run_chunk(chunk))
+
+        if self.tile_blend:
+            output.div_(weights)
+        return output
+
+    def get_feather(self, height, width, device):
+        """Weight window for blending upsampled tiles.
+
+        The weight ramps up linearly over the upsampled ``tile_pad`` at each side and is 1 in the centre. It never
+        reaches 0, so pixels covered by a single window (at the image border) are kept after normalization.
+
+        Args:
+            height (int): Height of the upsampled window.
+            width (int): Width of the upsampled window.
+            device (torch.device): Device of the weights.
+
+        Returns:
+            Tensor: The (1, 1, height, width) weight window.
+        """
+        ramp = self.tile_pad * self.scale
+
+        def profile(size):
+            pos = torch.arange(size, dtype=torch.float32, device=device) + 0.5
+            if ramp == 0:
+                return torch.ones_like(pos)
+            return torch.minimum(pos, size - pos).div_(ramp).clamp_(max=1)
+
+        return (profile(height)[:, None] * profile(width)[None, :])[None, None]
+
+    def blend_tiles(self, output, weights, feather, chunk, output_tiles):
+        """Add weighted upsampled windows and their weights to the accumulation buffers."""
+        batch, scale = output.shape[0], self.scale
+        for idx, ((wy0, wy1, wx0, wx1), _) in enumerate(chunk):
+            output_tile = output_tiles[idx * batch:(idx + 1) * batch]
+            region = (slice(None), slice(None), slice(wy0 * scale, wy1 * scale), slice(wx0 * scale, wx1 * scale))
+            output[region].addcmul_(output_tile.float(), feather)
+            weights[region].add_(feather)
+
+    def paste_tiles(self, output, chunk, output_tiles):
+        """Put the tile areas (without padding) of upsampled windows into the output image."""
+        batch, scale = output.shape[0], self.scale
+        for idx, ((wy0, _, wx0, _), (ty0, ty1, tx0, tx1)) in enumerate(chunk):
+            output_tile = output_tiles[idx * batch:(idx + 1) * batch]
+            # tile area inside the upsampled window
+            oy0, ox0 = (ty0 - wy0) * scale, (tx0 - wx0) * scale
+            oy1, ox1 = oy0 + (ty1 - ty0) * scale, ox0 + (tx1 - tx0) * scale
+            output[:, :, ty0 * scale:ty1 * scale, tx0 * scale:tx1 * scale] = output_tile[:, :, oy0:oy1, ox0:ox1]
+
+    def tile_process(self):
+        """Tiled inference on ``self.img``, see :meth:`tile_forward`."""
+        self.output = self.tile_forward(self.img)
+
+    def crop_output(self, output, mod_pad):
+        """Remove the mod pad and the pre pad from an output tensor.
+
+        Args:
+            output (Tensor): The NCHW output tensor.
+            mod_pad (tuple): (mod_pad_h, mod_pad_w) as returned by :meth:`pad_input`.
+
+        Returns:
+            Tensor: The cropped output tensor.
+        """
+        mod_pad_h, mod_pad_w = mod_pad
         # remove extra pad
-        if self.mod_scale is not None:
-            _, _, h, w = self.output.size()
-            self.output = self.output[:, :, 0:h - self.mod_pad_h * self.scale, 0:w - self.mod_pad_w * self.scale]
+        _, _, h, w = output.size()
+        output = output[:, :, 0:h - mod_pad_h * self.scale, 0:w - mod_pad_w * self.scale]
         # remove prepad
         if self.pre_pad != 0:
-            _, _, h, w = self.output.size()
-            self.output = self.output[:, :, 0:h - self.pre_pad * self.scale, 0:w - self.pre_pad * self.scale]
+            _, _, h, w = output.size()
+            output = output[:, :, 0:h - self.pre_pad * self.scale, 0:w - self.pre_pad * self.scale]
+        return output
+
+    def post_process(self):
+        mod_pad = (0, 0)
+        if self.mod_scale is not None:
+            mod_pad = (self.mod_pad_h, self.mod_pad_w)
+        self.output = self.crop_output(self.output, mod_pad)
         return self.output
 
+    @torch.no_grad()
+    def upsample(self, img):
+        """Upsample normalized RGB images without touching instance state.
+
+        Args:
+            img (ndarray): A single HWC image or a batch of NHWC images in [0, 1], RGB order.
+
+        Returns:
+            ndarray: The upsampled image(s) in [0, 1] as float32, with the same layout and channel order as the input.
+        """
+        tensor, mod_pad = self.pad_input(img, self.get_mod_scale())
+        if self.tile_size != 0:
+            output = self.tile_forward(tensor)
+        else:
+            output = self.model_forward(tensor)
+        output = self.crop_output(output, mod_pad)
+        output = np.transpose(output.data.float().cpu().clamp_(0, 1).numpy(), (0, 2, 3, 1))
+        return output[0] if img.ndim == 3 else output
+
+    def resize_output(self, output, h_input, w_input, outscale=None):
+        """Resize an upsampled image to the final scale, if it differs from the network scale."""
+        if outscale is not None and outscale != float(self.scale):
+            output = cv2.resize(
+                output, (
+                    int(w_input * outscale),
+                    int(h_input * outscale),
+                ), interpolation=cv2.INTER_LANCZOS4)
+        return output
+
     @torch.no_grad()
     def enhance(self, img, outscale=None, alpha_upsampler='realesrgan'):
         h_input, w_input = img.shape[0:2]
+        if img.dtype == np.uint8 and img.ndim == 3 and img.shape[2] == 3:
+            # fused path for 8-bit BGR images, e.g. video frames
+            output = self.upsample_bgr([img])[0]
+            return self.resize_output(output, h_input, w_input, outscale), 'RGB'
+
         # img: numpy
         img = img.astype(np.float32)
         if np.max(img) > 256:  # 16-bit image
@@ -216,29 +581,14 @@ class RealESRGANer():
             img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
 
         # ------------------- process image (without the alpha channel) ------------------- #
-        self.pre_process(img)
-        if self.tile_size > 0:
-            self.tile_process()
-        else:
-            self.process()
-        output_img = self.post_process()
-        output_img = output_img.data.squeeze().float().cpu().clamp_(0, 1).numpy()
-        output_img = np.transpose(output_img[[2, 1, 0], :, :], (1, 2, 0))
+        output_img = cv2.cvtColor(self.upsample(img), cv2.COLOR_RGB2BGR)
         if img_mode == 'L':
             output_img = cv2.cvtColor(output_img, cv2.COLOR_BGR2GRAY)
 
         # ------------------- process the alpha channel if necessary ------------------- #
         if img_mode == 'RGBA':
             if alpha_upsampler == 'realesrgan':
-                self.pre_process(alpha)
-                if self.tile_size > 0:
-                    self.tile_process()
-                else:
-                    self.process()
-                output_alpha = self.post_process()
-                output_alpha = output_alpha.data.squeeze().float().cpu().clamp_(0, 1).numpy()
-                output_alpha = np.transpose(output_alpha[[2, 1, 0], :, :], (1, 2, 0))
-                output_alpha = cv2.cvtColor(output_alpha, cv2.COLOR_BGR2GRAY)
+                output_alpha = cv2.cvtColor(self.upsample(alpha), cv2.COLOR_RGB2GRAY)
             else:  # use the cv2 resize for alpha channel
                 h, w = alpha.shape[0:2]
                 output_alpha = cv2.resize(alpha, (w * self.scale, h * self.scale), interpolation=cv2.INTER_LINEAR)
@@ -253,14 +603,116 @@ class RealESRGANer():
         else:
             output = (output_img * 255.0).round().astype(np.uint8)
 
-        if outscale is not None and outscale != float(self.scale):
-            output = cv2.resize(
-                output, (
-                    int(w_input * outscale),
-                    int(h_input * outscale),
-                ), interpolation=cv2.INTER_LANCZOS4)
+        return self.resize_output(output, h_input, w_input, outscale), img_mode
+
+    def get_batch_size(self, height, width, max_batch_size=16, memory_fraction=0.5):
+        """Pick the number of images per forward pass from the available memory.
+
+        Args:
+            height (int): Height of the input images.
+            width (int): Width of the input images.
+            max_batch_size (int): Upper bound of the batch size. Default: 16.
+            memory_fraction (float): Fraction of the free memory that may be used. Default: 0.5.
+
+        Returns:
+            int: The batch size, at least 1.
+        """
+        available = get_available_memory(self.device)
+        if available is None:
+            return 1
+        bytes_per_element = 2 if self.half else 4
+        height, width = height + self.pre_pad, width + self.pre_pad
+        per_image = height * width * self.scale**2 * ACTIVATION_CHANNELS * bytes_per_element
+        return int(max(1, min(max_batch_size, available * memory_fraction // per_image)))
+
+    @torch.no_grad()
+    def enhance_batch(self, imgs, outscale=None, batch_size=None):
+        """Upsample a list of images with batched inference.
+
+        Three-channel images with the same size and bit depth are stacked into one NCHW tensor per forward pass,
+        which amortises the per-call overhead and gives the backend larger GEMM shapes. Gray and RGBA images, as well
+        as the tile mode, fall back to :meth:`enhance`.
+
+        Args:
+            imgs (list[ndarray]): Input images (BGR, HWC).
+            outscale (float): The final upsampling scale of the images. Default: None.
+            batch_size (int): Number of images per forward pass. None picks it with :meth:`get_batch_size`.
+                Default: None.
+
+        Returns:
+            list[tuple]: (output, img_mode) for each input image, in the input order.
+        """
+        results = [None] * len(imgs)
+        groups = {}
+        for idx, img in enumerate(imgs):
+            if self.tile_size != 0 or img.ndim != 3 or img.shape[2] != 3:
+                results[idx] = self.enhance(img, outscale=outscale)
+                continue
+            if img.dtype == np.uint8:
+                max_range = 255
+            else:
+                max_range = 65535 if np.max(img) > 256 else 255
+            groups.setdefault((img.shape, img.dtype == np.uint8, max_range), []).append(idx)
+
+        for (shape, fused, max_range), indices in groups.items():
+            h_input, w_input = shape[0:2]
+            size = batch_size if batch_size else self.get_batch_size(h_input, w_input)
+            for start in range(0, len(indices), size):
+                chunk = indices[start:start + size]
+                if fused:
+                    output_batch = self.upsample_bgr([imgs[i] for i in chunk])
+                    for idx, output in zip(chunk, output_batch):
+                        results[idx] = (self.resize_output(output, h_input, w_input, outscale), 'RGB')
+                    continue
+
+                # BGR -> RGB and normalization for the whole batch
+                batch = np.stack([imgs[i] for i in chunk])[..., ::-1].astype(np.float32) / max_range
+
+                output_batch = self.upsample(batch)[..., ::-1]
+
+                for idx, output_img in zip(chunk, output_batch):
+                    if max_range == 65535:  # 16-bit image
+                        output = (output_img * 65535.0).round().astype(np.uint16)
+                    else:
+                        output = (output_img * 255.0).round().astype(np.uint8)
+                    results[idx] = (self.resize_output(output, h_input, w_input, outscale), 'RGB')
+
+        return results
+
+
+class RealESRGANerPool():
+    """A thread pool serving many requests with one shared RealESRGANer, i.e. one set of loaded weights.
+
+    Args:
+        upsampler (RealESRGANer): The shared upsampler.
+        num_workers (int): Number of worker threads. Default: 2.
+    """
+
+    def __init__(self, upsampler, num_workers=2):
+        self.upsampler = upsampler
+        self.executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix='realesrgan')
+
+    def submit(self, img, **kwargs):
+        """Schedule :meth:`RealESRGANer.enhance` for an image and return a ``concurrent.futures.Future``."""
+        return self.executor.submit(self.upsampler.enhance, img, **kwargs)
+
+    def enhance(self, img, **kwargs):
+        """Upsample an image on the pool and wait for the result, see :meth:`RealESRGANer.enhance`."""
+        return self.submit(img, **kwargs).result()
+
+    def map(self, imgs, **kwargs):
+        """Upsample several images concurrently and return the results in the input order."""
+        futures = [self.submit(img, **kwargs) for img in imgs]
+        return [future.result() for future in futures]
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
 
-        return output, img_mode
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
 
 
 class PrefetchReader(threading.Thread):
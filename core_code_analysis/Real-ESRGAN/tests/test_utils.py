@@ -1,7 +1,8 @@
 import numpy as np
+import torch
 from basicsr.archs.rrdbnet_arch import RRDBNet
 
-from realesrgan.utils import RealESRGANer
+from realesrgan.utils import RealESRGANer, RealESRGANerPool
 
 
 def test_realesrganer():
@@ -55,6 +56,37 @@ def test_realesrganer():
     restorer.tile_process()
     assert restorer.output.shape == (1, 3, 64, 64)
 
+    # ------------------ test tile_process with batched tiles ---------------- #
+    restorer.tile_batch_size = 3
+    restorer.tile_workers = 2
+    restorer.tile_size = 4
+    restorer.tile_process()
+    assert restorer.output.shape == (1, 3, 64, 64)
+    restorer.tile_batch_size = 1
+    restorer.tile_workers = 1
+    restorer.tile_size = 10
+
+    # ------------------ test tile_process with blending ---------------- #
+    restorer.tile_blend = True
+    restorer.tile_pad = 2
+    restorer.tile_process()
+    assert restorer.output.shape == (1, 3, 64, 64)
+    assert restorer.output.dtype == torch.float32
+    feather = restorer.get_feather(8, 8, 'cpu')
+    assert feather.shape == (1, 1, 8, 8)
+    assert feather.min() > 0 and feather.max() == 1
+    restorer.tile_blend = False
+    restorer.tile_pad = 10
+
+    # ------------------ test get_tiles ---------------- #
+    tiles = restorer.get_tiles(16, 16, 10)
+    assert len(tiles) == 4
+    assert all(window[1] - window[0] == 16 and window[3] - window[2] == 16 for window, _ in tiles)
+    assert tiles[-1][1] == (10, 16, 10, 16)
+
+    # ------------------ test get_tile_size ---------------- #
+    assert restorer.get_tile_size() >= 32
+
     # ------------------ test enhance ---------------- #
     img = np.random.random((12, 12, 3)).astype(np.float32)
     result = restorer.enhance(img, outscale=2)
@@ -85,3 +117,63 @@ def test_realesrganer():
     result = restorer.enhance(img, outscale=2, alpha_upsampler=None)
     assert result[0].shape == (8, 8, 4)
     assert result[1] == 'RGBA'
+
+    # ------------------ test pre_process with a batch ---------------- #
+    restorer.scale = 4
+    restorer.mod_scale = None
+    imgs = np.random.random((3, 12, 12, 3)).astype(np.float32)
+    restorer.pre_process(imgs)
+    assert restorer.img.shape == (3, 3, 14, 14)
+
+    # ------------------ test enhance_batch ---------------- #
+    restorer.tile_size = 0
+    imgs = [np.random.random((4, 4, 3)).astype(np.float32) for _ in range(3)]
+    results = restorer.enhance_batch(imgs, outscale=2, batch_size=2)
+    assert len(results) == 3
+    assert all(result[0].shape == (8, 8, 3) for result in results)
+    assert all(result[1] == 'RGB' for result in results)
+
+    # ------------------ test enhance_batch with mixed inputs ---------------- #
+    imgs = [
+        np.random.random((4, 4, 3)).astype(np.float32),
+        np.random.random((4, 4)).astype(np.float32),
+        np.random.random((6, 4, 3)).astype(np.float32)
+    ]
+    results = restorer.enhance_batch(imgs, outscale=2)
+    assert results[0][0].shape == (8, 8, 3)
+    assert results[1][0].shape == (8, 8)
+    assert results[1][1] == 'L'
+    assert results[2][0].shape == (12, 8, 3)
+
+    # ------------------ test get_batch_size ---------------- #
+    assert restorer.get_batch_size(4, 4, max_batch_size=4) in range(1, 5)
+
+
+def test_realesrganer_pool():
+    model = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=6, num_grow_ch=32, scale=4)
+    restorer = RealESRGANer(
+        scale=4,
+        model_path='experiments/pretrained_models/RealESRGAN_x4plus_anime_6B.pth',
+        model=model,
+        tile=0,
+        pre_pad=2,
+        half=False)
+
+    # ------------------ test concurrent enhance with one shared model ---------------- #
+    imgs = [np.random.random((4 + i, 4, 3)).astype(np.float32) for i in range(4)]
+    with RealESRGANerPool(restorer, num_workers=2) as pool:
+        results = pool.map(imgs, outscale=2)
+        single = pool.enhance(imgs[0], outscale=2)
+    assert [result[0].shape for result in results] == [(8 + 2 * i, 8, 3) for i in range(4)]
+    assert single[0].shape == (8, 8, 3)
+    assert not hasattr(restorer, 'img')
+
+    # ------------------ test the fused 8-bit path ---------------- #
+    img = (np.random.random((6, 4, 3)) * 255).astype(np.uint8)
+    fused, img_mode = restorer.enhance(img)
+    reference, _ = restorer.enhance(img.astype(np.float32))
+    assert fused.dtype == np.uint8 and fused.shape == (24, 16, 3)
+    assert img_mode == 'RGB'
+    assert np.abs(fused.astype(np.int32) - reference.astype(np.int32)).max() <= 1
+    results = restorer.enhance_batch([img, img], outscale=2)
+    assert all(result[0].shape == (12, 8, 3) and result[0].dtype == np.uint8 for result in results)
@@ -22,8 +22,14 @@ class Blender:
 
     def prepare(self, corners, sizes):
         dst_sz = cv.detail.resultRoi(corners=corners, sizes=sizes)
-        blend_width = np.sqrt(dst_sz[2] * dst_sz[3]) * self.blend_strength / 100
+        self.prepare_roi(dst_sz, self.get_blend_width(dst_sz))
 
+    def get_blend_width(self, dst_sz):
+        return np.sqrt(dst_sz[2] * dst_sz[3]) * self.blend_strength / 100
+
+    def prepare_roi(self, dst_sz, blend_width):
+        """Prepare blending into dst_sz (x, y, width, height) with a blend width
+        which may be derived from a larger panorama, see TiledBlender"""
         if self.blender_type == "no" or blend_width < 1:
             self.blender = cv.detail.Blender_createDefault(cv.detail.Blender_NO)
 
@@ -17,11 +17,13 @@ from stitching.camera_estimator import CameraEstimator
 from stitching.camera_wave_corrector import WaveCorrector
 from stitching.cropper import Cropper
 from stitching.exposure_error_compensator import ExposureErrorCompensator
+from stitching.feature_cache import FeatureCache
 from stitching.feature_detector import FeatureDetector
 from stitching.feature_matcher import FeatureMatcher
-from stitching.images import Images
+from stitching.images import ImageLoader, ImagePyramidCache, Images
 from stitching.seam_finder import SeamFinder
 from stitching.subsetter import Subsetter
+from stitching.tiled_blender import TiledBlender
 from stitching.timelapser import Timelapser
 from stitching.warper import Warper
 
@@ -57,6 +59,48 @@ def create_parser():
         "The default is %s Mpx" % Images.Resolution.MEDIUM.value,
         type=float,
     )
+    parser.add_argument(
+        "--image_cache_size",
+        action="store",
+        default=ImagePyramidCache.DEFAULT_MEMORY_BUDGET,
+        help="Memory budget in MB for the decoded images at all resolutions, "
+        "so every image file is only decoded once. Images exceeding the budget "
+        "are spilled to disk. 0 disables the cache. "
+        "The default is %s MB." % ImagePyramidCache.DEFAULT_MEMORY_BUDGET,
+        type=float,
+    )
+    parser.add_argument(
+        "--image_cache_dir",
+        action="store",
+        default=ImagePyramidCache.DEFAULT_SPILL_DIR,
+        help="Directory for the images spilled by the image cache. "
+        "By default the system's temporary directory is used.",
+        type=str,
+    )
+    parser.add_argument(
+        "--loading_workers",
+        action="store",
+        default=ImageLoader.DEFAULT_WORKERS,
+        help="Number of threads decoding image files ahead. "
+        "Values < 1 use all CPUs. "
+        "The default is %s." % ImageLoader.DEFAULT_WORKERS,
+        type=int,
+    )
+    parser.add_argument(
+        "--reduced_decoding",
+        action="store_true",
+        help="Decode JPEG files at 1/2, 1/4 or 1/8 of their size if they are "
+        "only needed at a lower resolution. "
+        "Default is '%s'." % ImageLoader.DEFAULT_REDUCED_DECODING,
+    )
+    parser.add_argument(
+        "--no-reduced_decoding",
+        action="store_false",
+        help="Always decode image files at their full size. "
+        "Default is '%s'." % (not ImageLoader.DEFAULT_REDUCED_DECODING),
+        dest="reduced_decoding",
+    )
+    parser.set_defaults(reduced_decoding=ImageLoader.DEFAULT_REDUCED_DECODING)
     parser.add_argument(
         "--detector",
         action="store",
@@ -75,6 +119,32 @@ def create_parser():
         "The default is 500.",
         type=int,
     )
+    parser.add_argument(
+        "--detection_workers",
+        action="store",
+        default=FeatureDetector.DEFAULT_WORKERS,
+        help="Number of threads detecting features in parallel. "
+        "Values < 1 use all CPUs. "
+        "The default is %s." % FeatureDetector.DEFAULT_WORKERS,
+        type=int,
+    )
+    parser.add_argument(
+        "--feature_cache_dir",
+        action="store",
+        default=FeatureCache.DEFAULT_CACHE_DIR,
+        help="Directory where detected features are cached across runs. "
+        "By default no features are cached.",
+        type=str,
+    )
+    parser.add_argument(
+        "--feature_cache_size",
+        action="store",
+        default=FeatureCache.DEFAULT_CACHE_SIZE,
+        help="Maximum size of the feature cache in MB, least recently used "
+        "features are evicted first. The default is %s MB."
+        % FeatureCache.DEFAULT_CACHE_SIZE,
+        type=float,
+    )
     parser.add_argument(
         "--feature_masks",
         nargs="*",
@@ -98,6 +168,34 @@ def create_parser():
         help="uses range_width to limit number of images to match with.",
         type=int,
     )
+    parser.add_argument(
+        "--loop_closures",
+        action="store",
+        default=FeatureMatcher.DEFAULT_LOOP_CLOSURES,
+        help="Number of additional long-range images (in 2, 4, 8, ... times "
+        "range_width distance) each image is matched with when range_width "
+        "is used. Useful for videos which revisit parts of the scene. "
+        "The default is %s." % FeatureMatcher.DEFAULT_LOOP_CLOSURES,
+        type=int,
+    )
+    parser.add_argument(
+        "--match_candidates",
+        action="store",
+        default=FeatureMatcher.DEFAULT_MATCH_CANDIDATES,
+        help="Match each image only with this number of candidate images with "
+        "the most similar global (VLAD) descriptors. Useful for large unordered "
+        "image sets. By default all pairs are matched.",
+        type=int,
+    )
+    parser.add_argument(
+        "--matching_workers",
+        action="store",
+        default=FeatureMatcher.DEFAULT_WORKERS,
+        help="Number of threads matching image pairs in parallel. "
+        "Values < 1 use all CPUs. "
+        "The default is %s." % FeatureMatcher.DEFAULT_WORKERS,
+        type=int,
+    )
     parser.add_argument(
         "--try_use_gpu",
         action="store_true",
@@ -254,6 +352,24 @@ def create_parser():
         "The default is '%s'." % Blender.DEFAULT_BLEND_STRENGTH,
         type=np.int32,
     )
+    parser.add_argument(
+        "--blend_tile_size",
+        action="store",
+        default=TiledBlender.DEFAULT_TILE_SIZE,
+        help="Blend the panorama in tiles of this size (in pixels), which are "
+        "written to a memory-mapped file, so the memory needed for blending "
+        "does not grow with the panorama size. "
+        "By default the panorama is blended as a whole.",
+        type=int,
+    )
+    parser.add_argument(
+        "--blend_tile_dir",
+        action="store",
+        default=TiledBlender.DEFAULT_TILE_DIR,
+        help="Directory for the files of the tiled blending. "
+        "By default the system's temporary directory is used.",
+        type=str,
+    )
     parser.add_argument(
         "--timelapse",
         action="store",
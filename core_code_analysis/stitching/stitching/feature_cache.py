@@ -0,0 +1,131 @@
+import hashlib
+import os
+import tempfile
+
+import cv2 as cv
+import numpy as np
+
+
+class FeatureCache:
+    """Persistent on-disk cache of image features.
+
+    Keypoints and descriptors are stored as numpy arrays, keyed by the image
+    content and the detection settings. The cache is bounded by max_size (MB),
+    the least recently used entries are evicted first."""
+
+    DEFAULT_CACHE_DIR = None
+    DEFAULT_CACHE_SIZE = 256
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size * 1024**2
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.cache_dir is not None
+
+    def detect(self, detector, imgs, *settings):
+        """Detect features with detector, reusing cached features.
+
+        settings are additional values the features depend on
+        (e.g. the resolution of the images)."""
+        if not self.enabled:
+            return detector.detect(imgs)
+
+        keys = [self.get_key(img, detector, *settings) for img in imgs]
+        features = [self.load(key) for key in keys]
+        missing = [idx for idx, feature in enumerate(features) if feature is None]
+        if missing:
+            detected = detector.detect([imgs[idx] for idx in missing])
+            for idx, feature in zip(missing, detected):
+                features[idx] = feature
+                self.save(keys[idx], feature)
+            self.evict()
+        return features
+
+    @staticmethod
+    def get_key(img, detector, *settings):
+        img = np.ascontiguousarray(img)
+        hasher = hashlib.blake2b(digest_size=20)
+        hasher.update(repr((img.shape, str(img.dtype))).encode())
+        hasher.update(img.data)
+        detector_settings = (
+            detector.detector_type,
+            sorted(detector.detector_kwargs.items()),
+        ) + settings
+        hasher.update(repr(detector_settings).encode())
+        return hasher.hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, key + ".npz")
+
+    def load(self, key):
+        path = self.get_path(key)
+        try:
+            with np.load(path) as data:
+                features = FeatureCache.create_features(
+                    tuple(int(i) for i in data["img_size"]),
+                    data["keypoints"],
+                    data["keypoint_ids"],
+                    data["descriptors"],
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+        # mark the entry as recently used
+        os.utime(path)
+        return features
+
+    def save(self, key, features):
+        keypoints = features.getKeypoints()
+        # write to a temporary file first, so readers never see partial entries
+        handle, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(handle, "wb") as file:
+            np.savez(
+                file,
+                img_size=np.array(features.img_size, np.int32),
+                keypoints=np.array(
+                    [(*k.pt, k.size, k.angle, k.response) for k in keypoints],
+                    np.float32,
+                ).reshape(-1, 5),
+                keypoint_ids=np.array(
+                    [(k.octave, k.class_id) for k in keypoints], np.int32
+                ).reshape(-1, 2),
+                descriptors=features.descriptors.get(),
+            )
+        os.replace(tmp_path, self.get_path(key))
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npz"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, name in sorted(entries):
+            if size <= self.max_size:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            size -= entry_size
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npz"):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    @staticmethod
+    def create_features(img_size, keypoints, keypoint_ids, descriptors):
+        # ImageFeatures can only be filled safely if created by OpenCV itself
+        features = cv.detail.computeImageFeatures2(
+            cv.ORB.create(), np.zeros((8, 8, 3), np.uint8)
+        )
+        features.img_size = img_size
+        features.keypoints = [
+            cv.KeyPoint(x, y, size, angle, response, int(octave), int(class_id))
+            for (x, y, size, angle, response), (octave, class_id) in zip(
+                keypoints.tolist(), keypoint_ids.tolist()
+            )
+        ]
+        features.descriptors = descriptors
+        return features
@@ -1,4 +1,7 @@
+import os
+import threading
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2 as cv
 import numpy as np
@@ -17,18 +20,42 @@ class FeatureDetector:
     DETECTOR_CHOICES["akaze"] = cv.AKAZE_create
 
     DEFAULT_DETECTOR = list(DETECTOR_CHOICES.keys())[0]
+    DEFAULT_WORKERS = 1
 
-    def __init__(self, detector=DEFAULT_DETECTOR, **kwargs):
+    def __init__(self, detector=DEFAULT_DETECTOR, workers=DEFAULT_WORKERS, **kwargs):
+        self.detector_type = detector
+        self.detector_kwargs = kwargs
         self.detector = FeatureDetector.DETECTOR_CHOICES[detector](**kwargs)
+        self.workers = os.cpu_count() if workers < 1 else workers
+        self._local = threading.local()
 
     def detect_features(self, img, *args, **kwargs):
         return cv.detail.computeImageFeatures2(self.detector, img, *args, **kwargs)
 
     def detect(self, imgs):
-        return [self.detect_features(img) for img in imgs]
+        return self.map(lambda detector, img: detector.detect_features(img), imgs)
+
+    def map(self, function, *iterables):
+        """Apply function(detector, *args) to all images, in parallel threads if
+        workers > 1 (OpenCV releases the GIL during detection). Every thread
+        gets its own detector, so detectors never run concurrently."""
+        if self.workers == 1:
+            return [function(self, *args) for args in zip(*iterables)]
+
+        def call(*args):
+            return function(self.get_thread_detector(), *args)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(call, *iterables))
+
+    def get_thread_detector(self):
+        if not hasattr(self._local, "detector"):
+            self._local.detector = FeatureDetector(
+                self.detector_type, **self.detector_kwargs
+            )
+        return self._local.detector
 
     def detect_with_masks(self, imgs, masks):
-        features = []
         for idx, (img, mask) in enumerate(zip(imgs, masks)):
             assert len(img.shape) == 3 and len(mask.shape) == 2
             if not len(imgs) == len(masks):
@@ -38,8 +65,11 @@ class FeatureDetector:
                     f"Resolution of mask {idx + 1} {mask.shape} does not match"
                     f" the resolution of image {idx + 1} {img.shape[:2]}."
                 )
-            features.append(self.detect_features(img, mask=mask))
-        return features
+        return self.map(
+            lambda detector, img, mask: detector.detect_features(img, mask=mask),
+            imgs,
+            masks,
+        )
 
     @staticmethod
     def draw_keypoints(img, features, **kwargs):
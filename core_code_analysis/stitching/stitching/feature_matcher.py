@@ -1,31 +1,226 @@
 import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2 as cv
 import numpy as np
 
+from .flann_matcher import FlannMatcher
+
 
 class FeatureMatcher:
     """https://docs.opencv.org/4.x/da/d87/classcv_1_1detail_1_1FeaturesMatcher.html"""
 
-    MATCHER_CHOICES = ("homography", "affine")
+    MATCHER_CHOICES = ("homography", "affine", "flann")
     DEFAULT_MATCHER = "homography"
     DEFAULT_RANGE_WIDTH = -1
+    DEFAULT_LOOP_CLOSURES = 0
+    DEFAULT_MATCH_CANDIDATES = 0
+    VOCABULARY_SIZE = 16
+    MAX_VOCABULARY_SAMPLES = 20000
+    DEFAULT_WORKERS = 1
+    CHUNKS_PER_WORKER = 4
 
     def __init__(
-        self, matcher_type=DEFAULT_MATCHER, range_width=DEFAULT_RANGE_WIDTH, **kwargs
+        self,
+        matcher_type=DEFAULT_MATCHER,
+        range_width=DEFAULT_RANGE_WIDTH,
+        loop_closures=DEFAULT_LOOP_CLOSURES,
+        match_candidates=DEFAULT_MATCH_CANDIDATES,
+        workers=DEFAULT_WORKERS,
+        **kwargs,
     ):
-        if matcher_type == "affine":
-            self.matcher = cv.detail_AffineBestOf2NearestMatcher(**kwargs)
+        self.matcher_type = matcher_type
+        self.matcher_kwargs = kwargs
+        self.range_width = range_width
+        self.loop_closures = loop_closures
+        self.match_candidates = match_candidates
+        self.use_match_mask = match_candidates > 0 or (
+            range_width != -1 and (matcher_type != "homography" or loop_closures > 0)
+        )
+        self.matcher = self.create_matcher(-1 if self.use_match_mask else range_width)
+        self.workers = os.cpu_count() if workers < 1 else workers
+        self._local = threading.local()
+
+    def create_matcher(self, range_width=DEFAULT_RANGE_WIDTH):
+        if self.matcher_type == "affine":
+            return cv.detail_AffineBestOf2NearestMatcher(**self.matcher_kwargs)
+        elif self.matcher_type == "flann":
+            return FlannMatcher(**self.matcher_kwargs)
         elif range_width == -1:
-            self.matcher = cv.detail_BestOf2NearestMatcher(**kwargs)
-        else:
-            self.matcher = cv.detail_BestOf2NearestRangeMatcher(range_width, **kwargs)
+            return cv.detail_BestOf2NearestMatcher(**self.matcher_kwargs)
+        return cv.detail_BestOf2NearestRangeMatcher(range_width, **self.matcher_kwargs)
 
     def match_features(self, features, *args, **kwargs):
+        if self.use_match_mask and not args and "mask" not in kwargs:
+            kwargs["mask"] = self.get_match_mask(features)
+        if self.workers > 1 and not args:
+            return self.match_features_parallel(features, **kwargs)
         pairwise_matches = self.matcher.apply2(features, *args, **kwargs)
         self.matcher.collectGarbage()
         return pairwise_matches
 
+    def match_features_parallel(self, features, mask=None):
+        """Match the image pairs in chunks on a thread pool (OpenCV releases the
+        GIL during matching). Every thread gets its own matcher. The results
+        are merged into the usual number_imgs x number_imgs list of matches."""
+        number_imgs = len(features)
+        if mask is None and self.range_width != -1:
+            mask = self.get_match_mask(features)
+        elif mask is None:
+            mask = np.ones((number_imgs, number_imgs), np.uint8)
+        pairs = np.argwhere(np.triu(np.asarray(mask), k=1))
+        nr_chunks = max(1, min(len(pairs), self.workers * self.CHUNKS_PER_WORKER))
+        chunks = np.array_split(pairs, nr_chunks)
+
+        def match_chunk(chunk):
+            chunk_mask = np.zeros((number_imgs, number_imgs), np.uint8)
+            chunk_mask[chunk[:, 0], chunk[:, 1]] = 1
+            matcher = self.get_thread_matcher()
+            pairwise_matches = matcher.apply2(features, mask=chunk_mask)
+            matcher.collectGarbage()
+            return pairwise_matches
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(match_chunk, chunks))
+
+        # pairs which are not matched are equal in all results
+        pairwise_matches = list(results[0])
+        for chunk, chunk_matches in zip(chunks[1:], results[1:]):
+            for i, j in chunk:
+                for idx in (i * number_imgs + j, j * number_imgs + i):
+                    pairwise_matches[idx] = chunk_matches[idx]
+        return pairwise_matches
+
+    def get_thread_matcher(self):
+        if not hasattr(self._local, "matcher"):
+            self._local.matcher = self.create_matcher()
+        return self._local.matcher
+
+    def get_match_mask(self, features):
+        mask = np.zeros((len(features), len(features)), np.uint8)
+        if self.range_width != -1:
+            mask |= FeatureMatcher.get_sequential_match_mask(
+                len(features), self.range_width, self.loop_closures
+            )
+        if self.match_candidates > 0:
+            mask |= FeatureMatcher.get_retrieval_match_mask(
+                features, self.match_candidates
+            )
+        return mask
+
+    @staticmethod
+    def get_sequential_match_mask(number_imgs, range_width, loop_closures=0):
+        """Mask of the image pairs to match for ordered (e.g. video) images.
+
+        Every image is matched with its range_width successors. Additionally
+        loop_closures long-range candidates are matched in exponentially
+        growing distances (2, 4, 8, ... times range_width), so that revisited
+        scene parts can still be connected."""
+        mask = np.zeros((number_imgs, number_imgs), np.uint8)
+        offsets = list(range(1, range_width + 1))
+        offsets += [range_width * 2**k for k in range(1, loop_closures + 1)]
+        for offset in offsets:
+            if offset < number_imgs:
+                idx = np.arange(number_imgs - offset)
+                mask[idx, idx + offset] = 1
+        return mask
+
+    @staticmethod
+    def get_retrieval_match_mask(features, candidates, vocabulary_size=VOCABULARY_SIZE):
+        """Mask of the image pairs with the most similar global descriptors.
+
+        Every image is matched with the candidates images whose VLAD descriptors
+        (aggregated from the local feature descriptors) are most similar, so
+        unordered image sets don't need to be matched pairwise."""
+        number_imgs = len(features)
+        candidates = min(candidates, number_imgs - 1)
+        global_descriptors = FeatureMatcher.get_global_descriptors(
+            features, vocabulary_size
+        )
+        similarities = global_descriptors @ global_descriptors.T
+        np.fill_diagonal(similarities, -np.inf)
+        most_similar = np.argsort(-similarities, axis=1, kind="stable")
+        mask = np.zeros((number_imgs, number_imgs), np.uint8)
+        mask[np.arange(number_imgs)[:, None], most_similar[:, :candidates]] = 1
+        return np.triu(mask | mask.T, k=1)
+
+    @staticmethod
+    def get_global_descriptors(features, vocabulary_size=VOCABULARY_SIZE):
+        """L2 normalized VLAD descriptor per image"""
+        descriptors = [FeatureMatcher.get_float_descriptors(f) for f in features]
+        dimension = max((d.shape[1] for d in descriptors), default=0)
+        if dimension == 0:
+            return np.zeros((len(features), 1), np.float32)
+        descriptors = [d.reshape(-1, dimension) for d in descriptors]
+        samples = np.concatenate(descriptors)
+        # the vocabulary must not depend on the global OpenCV RNG, otherwise
+        # stitching the same images twice may select other pairs
+        rng = np.random.default_rng(0)
+        if len(samples) > FeatureMatcher.MAX_VOCABULARY_SAMPLES:
+            idx = rng.choice(
+                len(samples), FeatureMatcher.MAX_VOCABULARY_SAMPLES, replace=False
+            )
+            samples = samples[idx]
+        vocabulary_size = min(vocabulary_size, len(samples))
+
+        criteria = (cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER, 20, 1e-3)
+        labels = FeatureMatcher.get_initial_labels(samples, vocabulary_size, rng)
+        _, _, vocabulary = cv.kmeans(
+            samples,
+            vocabulary_size,
+            labels,
+            criteria,
+            1,
+            cv.KMEANS_USE_INITIAL_LABELS,
+        )
+
+        global_descriptors = np.zeros(
+            (len(features), vocabulary_size, dimension), np.float32
+        )
+        for vlad, local_descriptors in zip(global_descriptors, descriptors):
+            distances = (vocabulary**2).sum(
+                axis=1
+            ) - 2 * local_descriptors @ vocabulary.T
+            words = np.argmin(distances, axis=1)
+            np.add.at(vlad, words, local_descriptors - vocabulary[words])
+        global_descriptors = global_descriptors.reshape(len(features), -1)
+        # power normalization reduces the influence of frequent visual words
+        global_descriptors = np.sign(global_descriptors) * np.sqrt(
+            np.abs(global_descriptors)
+        )
+        norms = np.linalg.norm(global_descriptors, axis=1, keepdims=True)
+        return global_descriptors / np.maximum(norms, np.finfo(np.float32).eps)
+
+    @staticmethod
+    def get_initial_labels(samples, number_clusters, rng):
+        """Cluster labels of the samples for centers chosen like in k-means++"""
+        idx = rng.integers(len(samples))
+        distances = ((samples - samples[idx]) ** 2).sum(axis=1)
+        centers = [idx]
+        for _ in range(1, number_clusters):
+            total = distances.sum()
+            if total > 0:
+                idx = rng.choice(len(samples), p=distances / total)
+            else:
+                idx = rng.integers(len(samples))
+            distances = np.minimum(distances, ((samples - samples[idx]) ** 2).sum(1))
+            centers.append(idx)
+        centers = samples[centers]
+        distances = (centers**2).sum(axis=1) - 2 * samples @ centers.T
+        return np.argmin(distances, axis=1).astype(np.int32).reshape(-1, 1)
+
+    @staticmethod
+    def get_float_descriptors(features):
+        descriptors = features.descriptors.get()
+        if descriptors is None:
+            return np.zeros((0, 0), np.float32)
+        if descriptors.dtype == np.uint8:
+            # binary descriptors (e.g. orb) as bit vectors
+            descriptors = np.unpackbits(descriptors, axis=1)
+        return descriptors.astype(np.float32)
+
     @staticmethod
     def draw_matches_matrix(
         imgs, features, matches, conf_thresh=1, inliers=False, **kwargs
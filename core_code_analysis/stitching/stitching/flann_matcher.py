@@ -0,0 +1,182 @@
+import cv2 as cv
+import numpy as np
+
+
+class FlannMatcher:
+    """https://docs.opencv.org/4.x/dc/de2/classcv_1_1FlannBasedMatcher.html
+
+    Drop-in replacement for cv.detail_BestOf2NearestMatcher which builds one
+    approximate nearest neighbour index per image (KD-trees for float
+    descriptors like sift, LSH for binary descriptors like orb) and reuses it
+    for all pairs the image is part of. The ratio test runs vectorized on the
+    knnSearch results, the homography is estimated with RANSAC and the
+    confidence is computed like in OpenCV, so the resulting
+    cv.detail.MatchesInfo can be used by the subsetter and camera estimation."""
+
+    KDTREE_PARAMS = {"algorithm": 1, "trees": 4}
+    LSH_PARAMS = {
+        "algorithm": 6,
+        "table_number": 6,
+        "key_size": 12,
+        "multi_probe_level": 1,
+    }
+    SEARCH_PARAMS = {"checks": 32}
+
+    def __init__(
+        self,
+        try_use_gpu=False,
+        match_conf=0.3,
+        num_matches_thresh1=6,
+        num_matches_thresh2=6,
+    ):
+        self.match_conf = match_conf
+        self.num_matches_thresh1 = num_matches_thresh1
+        self.num_matches_thresh2 = num_matches_thresh2
+        self.descriptors = {}
+        self.points = {}
+        self.indices = {}
+
+    def apply2(self, features, mask=None):
+        self.collectGarbage()
+        number_imgs = len(features)
+        if mask is None:
+            mask = np.ones((number_imgs, number_imgs), np.uint8)
+        pairwise_matches = [
+            FlannMatcher.create_matches_info() for _ in range(number_imgs**2)
+        ]
+        for i, j in np.argwhere(np.triu(np.asarray(mask), k=1)):
+            match, dual_match = self.match(features, i, j)
+            pairwise_matches[i * number_imgs + j] = match
+            pairwise_matches[j * number_imgs + i] = dual_match
+        return pairwise_matches
+
+    def collectGarbage(self):
+        self.descriptors.clear()
+        self.points.clear()
+        self.indices.clear()
+
+    def match(self, features, idx1, idx2):
+        match = FlannMatcher.create_matches_info(idx1, idx2)
+        dual_match = FlannMatcher.create_matches_info(idx2, idx1)
+
+        query_idx, train_idx, distances = self.find_matches(features, idx1, idx2)
+        match.matches = [
+            cv.DMatch(query, train, distance)
+            for query, train, distance in zip(
+                query_idx.tolist(), train_idx.tolist(), distances.tolist()
+            )
+        ]
+        dual_match.matches = [
+            cv.DMatch(train, query, distance)
+            for query, train, distance in zip(
+                query_idx.tolist(), train_idx.tolist(), distances.tolist()
+            )
+        ]
+        if len(query_idx) < self.num_matches_thresh1:
+            return match, dual_match
+
+        src_points = self.get_centered_points(features, idx1)[query_idx]
+        dst_points = self.get_centered_points(features, idx2)[train_idx]
+        H, inliers_mask = cv.findHomography(src_points, dst_points, cv.RANSAC)
+        if H is None or abs(np.linalg.det(H)) < np.finfo(np.float64).eps:
+            return match, dual_match
+
+        inliers_mask = inliers_mask.ravel().astype(np.uint8)
+        num_inliers = int(inliers_mask.sum())
+        # same confidence as in cv.detail_BestOf2NearestMatcher,
+        # too close images are considered duplicates
+        confidence = num_inliers / (8 + 0.3 * len(query_idx))
+        confidence = 0.0 if confidence > 3 else confidence
+
+        if num_inliers >= self.num_matches_thresh2:
+            # refine the homography using the inliers only
+            inliers = inliers_mask.astype(bool)
+            H, _ = cv.findHomography(
+                src_points[inliers], dst_points[inliers], cv.RANSAC
+            )
+
+        for matches_info in (match, dual_match):
+            matches_info.inliers_mask = inliers_mask
+            matches_info.num_inliers = num_inliers
+            matches_info.confidence = confidence
+        if H is not None:
+            match.H = H
+            dual_match.H = np.linalg.inv(H)
+        return match, dual_match
+
+    def find_matches(self, features, idx1, idx2):
+        """Matches passing the ratio test in both directions (1 -> 2 and 2 -> 1)
+        as arrays of query indices (in 1), train indices (in 2) and distances"""
+        query1, train1, distances1 = self.find_nearest(features, idx1, idx2)
+        query2, train2, distances2 = self.find_nearest(features, idx2, idx1)
+
+        number_keypoints2 = len(self.get_descriptors(features, idx2))
+        known = np.isin(
+            train2 * number_keypoints2 + query2, query1 * number_keypoints2 + train1
+        )
+        return (
+            np.concatenate([query1, train2[~known]]),
+            np.concatenate([train1, query2[~known]]),
+            np.concatenate([distances1, distances2[~known]]),
+        )
+
+    def find_nearest(self, features, query_img, train_img):
+        query_descriptors = self.get_descriptors(features, query_img)
+        number_query = len(query_descriptors)
+        number_train = len(self.get_descriptors(features, train_img))
+        empty = np.zeros(0, np.int64)
+        if number_query == 0 or number_train < 2:
+            return empty, empty, np.zeros(0, np.float32)
+
+        index = self.get_index(features, train_img)
+        neighbours, distances = index.knnSearch(
+            query_descriptors, 2, params=self.SEARCH_PARAMS
+        )
+        distances = distances.astype(np.float32)
+        if query_descriptors.dtype != np.uint8:
+            # KD-trees return squared euclidean distances
+            distances = np.sqrt(distances)
+        passed = (neighbours[:, 1] >= 0) & (
+            distances[:, 0] < (1 - self.match_conf) * distances[:, 1]
+        )
+        query_idx = np.flatnonzero(passed)
+        return query_idx, neighbours[passed, 0].astype(np.int64), distances[passed, 0]
+
+    def get_index(self, features, idx):
+        if idx not in self.indices:
+            descriptors = self.get_descriptors(features, idx)
+            if descriptors.dtype == np.uint8:
+                index_params = self.LSH_PARAMS
+            else:
+                index_params = self.KDTREE_PARAMS
+            self.indices[idx] = cv.flann_Index(descriptors, index_params)
+        return self.indices[idx]
+
+    def get_descriptors(self, features, idx):
+        if idx not in self.descriptors:
+            descriptors = features[idx].descriptors.get()
+            if descriptors is None:
+                descriptors = np.zeros((0, 0), np.float32)
+            elif descriptors.dtype != np.uint8:
+                descriptors = descriptors.astype(np.float32)
+            self.descriptors[idx] = descriptors
+        return self.descriptors[idx]
+
+    def get_centered_points(self, features, idx):
+        if idx not in self.points:
+            points = cv.KeyPoint_convert(features[idx].getKeypoints())
+            width, height = features[idx].img_size
+            self.points[idx] = points.reshape(-1, 2) - np.float32(
+                [width * 0.5, height * 0.5]
+            )
+        return self.points[idx]
+
+    @staticmethod
+    def create_matches_info(src_img_idx=-1, dst_img_idx=-1):
+        matches_info = cv.detail.MatchesInfo()
+        matches_info.src_img_idx = int(src_img_idx)
+        matches_info.dst_img_idx = int(dst_img_idx)
+        # H of MatchesInfo created from Python must be set explicitly,
+        # otherwise OpenCV crashes when reading it
+        matches_info.H = np.zeros((0, 0))
+        return matches_info
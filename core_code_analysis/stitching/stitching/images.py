@@ -1,12 +1,22 @@
+import hashlib
+import math
 import os
+import shutil
+import struct
+import tempfile
+import threading
+import weakref
 from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from enum import Enum
 from glob import glob
 
 import cv2 as cv
 import numpy as np
 
-from .megapix_scaler import MegapixDownscaler
+from .megapix_scaler import MegapixDownscaler, MegapixScaler
 from .stitching_error import StitchingError
 
 
@@ -22,6 +32,8 @@ class Images(ABC):
         medium_megapix=Resolution.MEDIUM.value,
         low_megapix=Resolution.LOW.value,
         final_megapix=Resolution.FINAL.value,
+        cache=None,
+        loader=None,
     ):
         if not isinstance(images, list):
             raise StitchingError("images must be a list of images or filenames")
@@ -31,7 +43,9 @@ class Images(ABC):
         if Images.check_list_element_types(images, np.ndarray):
             return _NumpyImages(images, medium_megapix, low_megapix, final_megapix)
         elif Images.check_list_element_types(images, str):
-            return _FilenameImages(images, medium_megapix, low_megapix, final_megapix)
+            return _FilenameImages(
+                images, medium_megapix, low_megapix, final_megapix, cache, loader
+            )
         else:
             raise StitchingError(
                 """invalid images list:
@@ -92,6 +106,18 @@ class Images(ABC):
         Images.check_resolution(resolution)
         return self._scalers[resolution.name]
 
+    def scale_resolution(self, resolution, factor):
+        """Multiply the scale of a resolution by factor, which may be > 1.
+
+        Used when the images are replaced by upscaled versions, e.g. by a
+        super-resolution model, before they are processed at this resolution.
+        """
+        assert self._scales_set
+        scaler = self._get_scaler(resolution)
+        upscaler = MegapixScaler(scaler.megapix)
+        upscaler.set_scale(scaler.scale * factor)
+        self._scalers[resolution.name] = upscaler
+
     def get_ratio(self, from_resolution, to_resolution):
         assert self._scales_set
         Images.check_resolution(from_resolution)
@@ -109,12 +135,36 @@ class Images(ABC):
         ]
 
     @staticmethod
-    def read_image(img_name):
-        img = cv.imread(img_name)
+    def read_image(img_name, flags=cv.IMREAD_COLOR):
+        img = cv.imread(img_name, flags)
         if img is None:
             raise StitchingError("Cannot read image " + img_name)
         return img
 
+    @staticmethod
+    def read_jpeg_size(img_name):
+        """(width, height) from the header of a JPEG file, None for other files"""
+        try:
+            with open(img_name, "rb") as file:
+                if file.read(2) != b"\xff\xd8":
+                    return None
+                while True:
+                    marker = file.read(2)
+                    if len(marker) < 2 or marker[0] != 0xFF:
+                        return None
+                    length = struct.unpack(">H", file.read(2))[0]
+                    # start of frame markers, except DHT, JPG and DAC
+                    if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (
+                        0xC4,
+                        0xC8,
+                        0xCC,
+                    ):
+                        _, height, width = struct.unpack(">BHH", file.read(5))
+                        return width, height
+                    file.seek(length - 2, os.SEEK_CUR)
+        except (OSError, struct.error):
+            return None
+
     @staticmethod
     def get_image_size(img):
         """(width, height)"""
@@ -123,6 +173,8 @@ class Images(ABC):
     @staticmethod
     def resize_img_by_scaler(scaler, size, img):
         desired_size = scaler.get_scaled_img_size(size)
+        if Images.get_image_size(img) == desired_size:
+            return img
         return cv.resize(img, desired_size, interpolation=cv.INTER_LINEAR_EXACT)
 
     @staticmethod
@@ -169,32 +221,285 @@ class _NumpyImages(Images):
 
 
 class _FilenameImages(Images):
-    def __init__(self, images, medium_megapix, low_megapix, final_megapix):
+    def __init__(
+        self,
+        images,
+        medium_megapix,
+        low_megapix,
+        final_megapix,
+        cache=None,
+        loader=None,
+    ):
         super().__init__(images, medium_megapix, low_megapix, final_megapix)
         self._names = Images.resolve_wildcards(images)
         self._names_set = True
         if len(self.names) < 2:
             raise StitchingError("2 or more Images needed")
         self._sizes = []
+        self._cache = cache
+        self._loader = ImageLoader() if loader is None else loader
+        self._megapix = (medium_megapix, low_megapix, final_megapix)
 
     def subset(self, indices):
         super().subset(indices)
 
-    def __iter__(self):
-        for idx, name in enumerate(self.names):
-            img = Images.read_image(name)
-            size = Images.get_image_size(img)
-
-            # ------
-            # Attention for side effects!
-            # the scalers are set on the first run
-            self._set_scales(size)
-
-            # the original image sizes are set on the first run
-            if not self._sizes_set:
-                self._sizes.append(size)
-                if idx + 1 == len(self.names):
-                    self._sizes_set = True
-            # ------
+    def resize(self, resolution, imgs=None):
+        if imgs is not None:
+            yield from super().resize(resolution, imgs)
+            return
+        Images.check_resolution(resolution)
+        if self._cache is not None and self._cache.enabled:
+            yield from self._resize_cached(resolution)
+            return
+
+        scale = self._get_decoding_scale(resolution)
+        tasks = [partial(self._loader.read, name, scale) for name in self.names]
+        for idx, (size, img) in enumerate(self._loader.load(tasks)):
+            self._set_size(idx, size)
+            yield Images.resize_img_by_scaler(self._get_scaler(resolution), size, img)
+
+    def _resize_cached(self, resolution):
+        scale = self._get_decoding_scale(
+            Images.Resolution.MEDIUM, Images.Resolution.FINAL
+        )
+        tasks = [
+            partial(self._load_pyramid_level, name, resolution.name, scale)
+            for name in self.names
+        ]
+        for idx, (key, cached, loaded) in enumerate(self._loader.load(tasks)):
+            if cached is not None:
+                size, img = cached
+                self._set_size(idx, size)
+                # the scale of a resolution may have changed (scale_resolution)
+                if Images.get_image_size(img) == self._get_scaler(
+                    resolution
+                ).get_scaled_img_size(size):
+                    yield img
+                    continue
+                loaded = self._loader.read(
+                    self.names[idx],
+                    self._get_decoding_scale(
+                        Images.Resolution.MEDIUM, Images.Resolution.FINAL
+                    ),
+                )
+
+            size, img = loaded
+            self._set_size(idx, size)
+            pyramid = self._create_pyramid(size, img)
+            self._cache.put(key, size, pyramid)
+            yield pyramid[resolution.name]
+
+    def _load_pyramid_level(self, name, level, scale):
+        """Runs on the loader threads: the cached level or the decoded image"""
+        key = ImagePyramidCache.get_key(name, *self._megapix)
+        cached = self._cache.get(key, level)
+        if cached is not None:
+            return key, cached, None
+        return key, None, self._loader.read(name, scale)
+
+    def _get_decoding_scale(self, *resolutions):
+        """The largest scale of the resolutions, 1 if the scales are unknown"""
+        if not self._scales_set and self._loader.reduced_decoding:
+            # the scales only depend on the number of pixels of the first image,
+            # which is not changed by an exif orientation
+            size = Images.read_jpeg_size(self.names[0])
+            if size is not None:
+                self._set_scales(size)
+        if not self._scales_set:
+            return 1
+        return max(self._get_scaler(resolution).scale for resolution in resolutions)
+
+    def _create_pyramid(self, size, img):
+        """All resolutions of an image, the low resolution is derived from the
+        medium resolution like in the stitching pipeline"""
+        medium = Images.resize_img_by_scaler(self._scalers["MEDIUM"], size, img)
+        return {
+            "MEDIUM": medium,
+            "LOW": Images.resize_img_by_scaler(self._scalers["LOW"], size, medium),
+            "FINAL": Images.resize_img_by_scaler(self._scalers["FINAL"], size, img),
+        }
+
+    def _set_size(self, idx, size):
+        # ------
+        # Attention for side effects!
+        # the scalers are set on the first run
+        self._set_scales(size)
+
+        # the original image sizes are set on the first run
+        if not self._sizes_set:
+            self._sizes.append(size)
+            if idx + 1 == len(self.names):
+                self._sizes_set = True
+        # ------
 
+    def __iter__(self):
+        tasks = [partial(self._loader.read, name) for name in self.names]
+        for idx, (size, img) in enumerate(self._loader.load(tasks)):
+            self._set_size(idx, size)
             yield img
+
+
+class ImageLoader:
+    """Decodes image files ahead on a thread pool.
+
+    At most PREFETCH_PER_WORKER images per worker are decoded ahead of the
+    consumer (OpenCV releases the GIL while decoding), the images are returned
+    in order. Values < 1 for workers use all CPUs.
+
+    With reduced_decoding, JPEG files which are only needed at a fraction of
+    their resolution are decoded at 1/2, 1/4 or 1/8 of their size
+    (cv.IMREAD_REDUCED_COLOR_*), which is considerably faster."""
+
+    DEFAULT_WORKERS = 2
+    DEFAULT_REDUCED_DECODING = True
+    PREFETCH_PER_WORKER = 2
+    REDUCED_FLAGS = {
+        8: cv.IMREAD_REDUCED_COLOR_8,
+        4: cv.IMREAD_REDUCED_COLOR_4,
+        2: cv.IMREAD_REDUCED_COLOR_2,
+    }
+
+    def __init__(
+        self, workers=DEFAULT_WORKERS, reduced_decoding=DEFAULT_REDUCED_DECODING
+    ):
+        self.workers = os.cpu_count() if workers < 1 else workers
+        self.reduced_decoding = reduced_decoding
+
+    def load(self, tasks):
+        """Yield the results of the tasks (functions without arguments) in order"""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = deque()
+            try:
+                for task in tasks:
+                    futures.append(executor.submit(task))
+                    if len(futures) > self.workers * self.PREFETCH_PER_WORKER:
+                        yield futures.popleft().result()
+                while futures:
+                    yield futures.popleft().result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def read(self, img_name, scale=1):
+        """(original size, image) of an image file which is needed at scale.
+
+        The image may be decoded at a reduced resolution, but never below
+        scale, so it can be resized to its scaled size as usual."""
+        reduction = ImageLoader.get_reduction(scale) if self.reduced_decoding else 1
+        if reduction > 1:
+            size = Images.read_jpeg_size(img_name)
+            if size is not None:
+                img = Images.read_image(img_name, self.REDUCED_FLAGS[reduction])
+                # images rotated by their exif orientation are decoded again
+                if Images.get_image_size(img) == tuple(
+                    math.ceil(length / reduction) for length in size
+                ):
+                    return size, img
+        img = Images.read_image(img_name)
+        return Images.get_image_size(img), img
+
+    @staticmethod
+    def get_reduction(scale):
+        for reduction in ImageLoader.REDUCED_FLAGS:
+            if scale * reduction <= 1:
+                return reduction
+        return 1
+
+
+class ImagePyramidCache:
+    """Cache of the MEDIUM, LOW and FINAL resolution versions of image files.
+
+    Every file is decoded once and all resolutions are created in one pass.
+    The pyramids are kept in memory up to memory_budget (MB), the least
+    recently used pyramids are spilled to disk as uncompressed arrays, which
+    are much faster to load than to decode again. Spilled files are written to
+    a temporary directory (inside spill_dir if given) which is removed with the
+    cache. A memory_budget of 0 disables the cache."""
+
+    DEFAULT_MEMORY_BUDGET = 512
+    DEFAULT_SPILL_DIR = None
+
+    def __init__(
+        self, memory_budget=DEFAULT_MEMORY_BUDGET, spill_dir=DEFAULT_SPILL_DIR
+    ):
+        self.memory_budget = memory_budget * 1024**2
+        self.spill_dir = spill_dir
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._spilled = {}
+        self._spill_path = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.memory_budget > 0
+
+    @staticmethod
+    def get_key(img_name, *settings):
+        stat = os.stat(img_name)
+        return (os.path.abspath(img_name), stat.st_mtime_ns, stat.st_size) + settings
+
+    def get(self, key, level):
+        """(original size, image) of a level or None if key is not cached"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                size, pyramid = self._memory[key]
+                return size, pyramid[level]
+            path = self._spilled.get(key)
+        if path is None:
+            return None
+        try:
+            with np.load(path) as data:
+                return tuple(int(i) for i in data["size"]), data[level]
+        except OSError:
+            # removed in the meantime
+            return None
+
+    def put(self, key, size, pyramid):
+        with self._lock:
+            self._remove(key)
+            self._memory[key] = (size, pyramid)
+            self._memory_size += ImagePyramidCache.get_nbytes(pyramid)
+            while self._memory_size > self.memory_budget:
+                self.spill(*self._memory.popitem(last=False))
+
+    def spill(self, key, entry):
+        size, pyramid = entry
+        self._memory_size -= ImagePyramidCache.get_nbytes(pyramid)
+        name = hashlib.blake2b(repr(key).encode(), digest_size=20).hexdigest()
+        path = os.path.join(self.get_spill_path(), name + ".npz")
+        np.savez(path, size=np.array(size), **pyramid)
+        self._spilled[key] = path
+
+    def get_spill_path(self):
+        if self._spill_path is None:
+            if self.spill_dir is not None:
+                os.makedirs(self.spill_dir, exist_ok=True)
+            self._spill_path = tempfile.mkdtemp(
+                prefix="stitching_pyramids_", dir=self.spill_dir
+            )
+            self._finalizer = weakref.finalize(
+                self, shutil.rmtree, self._spill_path, ignore_errors=True
+            )
+        return self._spill_path
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        if key in self._memory:
+            _, pyramid = self._memory.pop(key)
+            self._memory_size -= ImagePyramidCache.get_nbytes(pyramid)
+        if key in self._spilled:
+            os.remove(self._spilled.pop(key))
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._memory) + list(self._spilled):
+                self._remove(key)
+
+    @staticmethod
+    def get_nbytes(pyramid):
+        return sum(img.nbytes for img in pyramid.values())
@@ -0,0 +1,275 @@
+import cv2 as cv
+import numpy as np
+
+from .cropper import Rectangle
+from .images import Images
+from .stitcher import Stitcher
+from .stitching_error import StitchingError
+
+
+class IncrementalStitcher(Stitcher):
+    """Stitcher for growing image sets, e.g. the frames of a running video.
+
+    Features, pairwise matches and camera parameters are kept between calls of
+    add(). New images are only detected and matched (against all previous
+    images), the camera adjustment is warm started from the previous cameras
+    and only the panorama region covered by the new images is composed again.
+    Only the pixels assigned to the new images by the seam finder are updated,
+    feathered over the blend width into the previous panorama.
+
+    The cameras of images which are already part of the panorama are kept
+    fixed, the new cameras are aligned to them. The panorama is not cropped.
+    """
+
+    DEFAULT_SETTINGS = Stitcher.DEFAULT_SETTINGS.copy()
+    DEFAULT_SETTINGS["crop"] = False
+
+    def initialize_stitcher(self, **kwargs):
+        super().initialize_stitcher(**kwargs)
+        if self.cropper.do_crop:
+            raise StitchingError("IncrementalStitcher does not support cropping")
+        if self.timelapser.do_timelapse:
+            raise StitchingError("IncrementalStitcher does not support timelapses")
+        self.reset()
+
+    def reset(self):
+        self.imgs = []
+        self.features = []
+        self.pairwise_matches = []
+        self.cameras = {}
+        self.composed = set()
+        self.panorama = None
+        self.panorama_mask = None
+        self.panorama_roi = None
+
+    def stitch(self, images, feature_masks=[]):
+        if len(feature_masks) > 0:
+            raise StitchingError("IncrementalStitcher does not support feature masks")
+        self.reset()
+        return self.add(images)
+
+    def add(self, images):
+        """Add images (numpy arrays) and return the extended panorama.
+
+        Returns None as long as less than two images were added."""
+        images = list(images)
+        if not Images.check_list_element_types(images, np.ndarray):
+            raise StitchingError("IncrementalStitcher needs loaded images")
+        self.imgs.extend(images)
+        if len(self.imgs) < 2:
+            return None
+
+        # the first image is not detected as long as it is alone
+        new_indices = list(range(len(self.features), len(self.imgs)))
+        self.images = self.get_images(new_indices)
+        self.features += self.find_features(self.resize_medium_resolution())
+        self.pairwise_matches = self.match_new_features(len(new_indices))
+
+        indices = self.subsetter.subset(
+            [str(idx + 1) for idx in range(len(self.imgs))],
+            self.features,
+            self.pairwise_matches,
+        )
+        indices = [int(idx) for idx in indices]
+        if not any(idx in self.cameras for idx in indices):
+            # first estimation or the subsetter switched to another component
+            self.cameras = {}
+            self.composed = set()
+            self.panorama = None
+        cameras = self.estimate_cameras(indices)
+        for idx, camera in zip(indices, cameras):
+            self.cameras[idx] = camera
+
+        if not self.composed.issubset(indices):
+            # images were dropped by the subsetter, compose everything again
+            self.composed = set()
+            self.panorama = None
+        if not self.composed.issuperset(indices):
+            self.compose_new_images(indices, cameras)
+        return self.panorama
+
+    def get_images(self, indices):
+        images = Images.of(
+            self.imgs, self.medium_megapix, self.low_megapix, self.final_megapix
+        )
+        images.subset(indices)
+        return images
+
+    def match_new_features(self, number_new):
+        """Match the new features against all features and merge the result
+        with the previous pairwise matches"""
+        number_imgs = len(self.features)
+        number_old = number_imgs - number_new
+        mask = np.triu(np.ones((number_imgs, number_imgs), np.uint8), k=1)
+        if self.matcher.range_width != -1 or self.matcher.match_candidates > 0:
+            mask &= self.matcher.get_match_mask(self.features)
+        mask[:, :number_old] = 0
+        pairwise_matches = list(self.matcher.match_features(self.features, mask=mask))
+
+        for i in range(number_old):
+            for j in range(number_old):
+                pairwise_matches[i * number_imgs + j] = self.pairwise_matches[
+                    i * number_old + j
+                ]
+        return pairwise_matches
+
+    def estimate_cameras(self, indices):
+        features = [self.features[idx] for idx in indices]
+        matches = np.array(self.pairwise_matches, dtype=object).reshape(
+            len(self.features), len(self.features)
+        )
+        matches = list(matches[np.ix_(indices, indices)].ravel())
+
+        cameras = self.estimate_camera_parameters(features, matches)
+        if not self.cameras:
+            cameras = self.refine_camera_parameters(features, matches, cameras)
+            cameras = self.perform_wave_correction(cameras)
+            self.estimate_scale(cameras)
+            return cameras
+
+        # warm start with the known cameras and align the result to them
+        cameras = self.align_cameras(indices, cameras)
+        cameras = self.refine_camera_parameters(features, matches, cameras)
+        return self.align_cameras(indices, cameras)
+
+    def align_cameras(self, indices, cameras):
+        """Set the known cameras and transform the others into their frame.
+
+        Estimated cameras differ from the known ones by a global transformation,
+        which is derived from the last known image."""
+        anchor = max(k for k, idx in enumerate(indices) if idx in self.cameras)
+        known_camera = self.cameras[indices[anchor]]
+        transformation = np.float64(known_camera.R) @ np.linalg.inv(
+            np.float64(cameras[anchor].R)
+        )
+        focal_ratio = known_camera.focal / cameras[anchor].focal
+
+        for idx, camera in zip(indices, cameras):
+            if idx in self.cameras:
+                known_camera = self.cameras[idx]
+                camera.R = known_camera.R
+                camera.t = known_camera.t
+                camera.focal = known_camera.focal
+                camera.aspect = known_camera.aspect
+                camera.ppx = known_camera.ppx
+                camera.ppy = known_camera.ppy
+            else:
+                camera.R = (transformation @ np.float64(camera.R)).astype(np.float32)
+                camera.focal *= focal_ratio
+        return cameras
+
+    def compose_new_images(self, indices, cameras):
+        """Compose the images overlapping the region of the new images and
+        update this region of the panorama"""
+        images = self.get_images(indices)
+        sizes = images.get_scaled_img_sizes(Images.Resolution.FINAL)
+        aspect = images.get_ratio(Images.Resolution.MEDIUM, Images.Resolution.FINAL)
+        corners, sizes = self.warper.warp_rois(sizes, cameras, aspect)
+        rois = [Rectangle(*corner, *size) for corner, size in zip(corners, sizes)]
+
+        region = IncrementalStitcher.get_bounding_rectangle(
+            [roi for idx, roi in zip(indices, rois) if idx not in self.composed]
+        )
+        affected = [
+            k
+            for k, roi in enumerate(rois)
+            if IncrementalStitcher.intersect(roi, region)
+        ]
+        self.images = self.get_images([indices[k] for k in affected])
+        affected_cameras = [cameras[k] for k in affected]
+        is_new = [indices[k] not in self.composed for k in affected]
+
+        imgs = self.resize_low_resolution()
+        imgs, masks, corners, sizes = self.warp_low_resolution(imgs, affected_cameras)
+        self.estimate_exposure_errors(corners, imgs, masks)
+        seam_masks = self.find_seam_masks(imgs, corners, masks)
+
+        imgs = self.resize_final_resolution()
+        imgs, masks, corners, sizes = self.warp_final_resolution(imgs, affected_cameras)
+        self.set_masks(masks)
+        imgs = self.compensate_exposure_errors(corners, imgs)
+        seam_masks = self.resize_seam_masks(seam_masks)
+        blended_roi = IncrementalStitcher.get_bounding_rectangle(
+            [Rectangle(*corner, *size) for corner, size in zip(corners, sizes)]
+        )
+        new_mask = np.zeros((blended_roi.height, blended_roi.width), np.uint8)
+        seam_masks = IncrementalStitcher.collect_seam_masks(
+            seam_masks, corners, is_new, new_mask, blended_roi
+        )
+        self.initialize_composition(corners, sizes)
+        self.blend_images(imgs, seam_masks, corners)
+        blended, blended_mask = self.blender.blend()
+
+        self.update_panorama(blended, blended_mask, blended_roi, new_mask)
+        self.composed.update(indices)
+
+    @staticmethod
+    def collect_seam_masks(seam_masks, corners, is_new, new_mask, roi):
+        """Pass the seam masks through and draw those of the new images into
+        new_mask, which covers roi"""
+        for seam_mask, corner, new in zip(seam_masks, corners, is_new):
+            if new:
+                mask = cv.UMat.get(seam_mask)
+                x, y = corner[0] - roi.x, corner[1] - roi.y
+                height, width = mask.shape[:2]
+                new_mask[y : y + height, x : x + width] |= mask
+            yield seam_mask
+
+    def update_panorama(self, blended, blended_mask, blended_roi, new_mask):
+        if self.panorama is None:
+            self.panorama = blended
+            self.panorama_mask = blended_mask
+            self.panorama_roi = blended_roi
+            return
+
+        roi = IncrementalStitcher.get_bounding_rectangle(
+            [self.panorama_roi, blended_roi]
+        )
+        if roi != self.panorama_roi:
+            panorama = np.zeros((roi.height, roi.width, 3), np.uint8)
+            panorama_mask = np.zeros((roi.height, roi.width), np.uint8)
+            x, y = self.panorama_roi.x - roi.x, self.panorama_roi.y - roi.y
+            height, width = self.panorama.shape[:2]
+            panorama[y : y + height, x : x + width] = self.panorama
+            panorama_mask[y : y + height, x : x + width] = self.panorama_mask
+            self.panorama, self.panorama_mask, self.panorama_roi = (
+                panorama,
+                panorama_mask,
+                roi,
+            )
+
+        # the pixels of the new images are taken from the blended images, the
+        # previous panorama fades into them over the blend width
+        weights = self.get_update_weights(blended_mask, blended_roi, new_mask)
+        x, y = blended_roi.x - roi.x, blended_roi.y - roi.y
+        dst = np.s_[y : y + blended_roi.height, x : x + blended_roi.width]
+        weights[self.panorama_mask[dst] == 0] = 1
+        weights[blended_mask == 0] = 0
+        weights = weights[..., np.newaxis]
+        panorama = self.panorama[dst].astype(np.float32)
+        panorama += weights * (blended.astype(np.float32) - panorama)
+        self.panorama[dst] = np.round(panorama).astype(np.uint8)
+        self.panorama_mask[dst][weights[..., 0] > 0] = 255
+
+    def get_update_weights(self, blended_mask, blended_roi, new_mask):
+        blend_width = self.blender.get_blend_width(
+            (0, 0, blended_roi.width, blended_roi.height)
+        )
+        if self.blender.blender_type == "no" or blend_width < 1:
+            return np.float32(new_mask > 0)
+        distances = cv.distanceTransform(255 - new_mask, cv.DIST_L2, 3)
+        return np.clip(1 - distances / blend_width, 0, 1)
+
+    @staticmethod
+    def get_bounding_rectangle(rectangles):
+        x1 = min(rectangle.x for rectangle in rectangles)
+        y1 = min(rectangle.y for rectangle in rectangles)
+        x2 = max(rectangle.x2 for rectangle in rectangles)
+        y2 = max(rectangle.y2 for rectangle in rectangles)
+        return Rectangle(x1, y1, x2 - x1, y2 - y1)
+
+    @staticmethod
+    def intersect(rectangle1, rectangle2):
+        overlap_x = rectangle1.x < rectangle2.x2 and rectangle2.x < rectangle1.x2
+        overlap_y = rectangle1.y < rectangle2.y2 and rectangle2.y < rectangle1.y2
+        return overlap_x and overlap_y
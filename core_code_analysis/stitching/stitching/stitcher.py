@@ -1,18 +1,22 @@
 import warnings
 from types import SimpleNamespace
 
+import numpy as np
+
 from .blender import Blender
 from .camera_adjuster import CameraAdjuster
 from .camera_estimator import CameraEstimator
 from .camera_wave_corrector import WaveCorrector
-from .cropper import Cropper
+from .cropper import Cropper, Rectangle
 from .exposure_error_compensator import ExposureErrorCompensator
+from .feature_cache import FeatureCache
 from .feature_detector import FeatureDetector
 from .feature_matcher import FeatureMatcher
-from .images import Images
+from .images import ImageLoader, ImagePyramidCache, Images
 from .seam_finder import SeamFinder
 from .stitching_error import StitchingError, StitchingWarning
 from .subsetter import Subsetter
+from .tiled_blender import TiledBlender
 from .timelapser import Timelapser
 from .verbose import verbose_stitching
 from .warper import Warper
@@ -21,10 +25,20 @@ from .warper import Warper
 class Stitcher:
     DEFAULT_SETTINGS = {
         "medium_megapix": Images.Resolution.MEDIUM.value,
+        "image_cache_size": ImagePyramidCache.DEFAULT_MEMORY_BUDGET,
+        "image_cache_dir": ImagePyramidCache.DEFAULT_SPILL_DIR,
+        "loading_workers": ImageLoader.DEFAULT_WORKERS,
+        "reduced_decoding": ImageLoader.DEFAULT_REDUCED_DECODING,
         "detector": FeatureDetector.DEFAULT_DETECTOR,
         "nfeatures": 500,
+        "detection_workers": FeatureDetector.DEFAULT_WORKERS,
+        "feature_cache_dir": FeatureCache.DEFAULT_CACHE_DIR,
+        "feature_cache_size": FeatureCache.DEFAULT_CACHE_SIZE,
         "matcher_type": FeatureMatcher.DEFAULT_MATCHER,
         "range_width": FeatureMatcher.DEFAULT_RANGE_WIDTH,
+        "loop_closures": FeatureMatcher.DEFAULT_LOOP_CLOSURES,
+        "match_candidates": FeatureMatcher.DEFAULT_MATCH_CANDIDATES,
+        "matching_workers": FeatureMatcher.DEFAULT_WORKERS,
         "try_use_gpu": False,
         "match_conf": None,
         "confidence_threshold": Subsetter.DEFAULT_CONFIDENCE_THRESHOLD,
@@ -43,6 +57,8 @@ class Stitcher:
         "final_megapix": Images.Resolution.FINAL.value,
         "blender_type": Blender.DEFAULT_BLENDER,
         "blend_strength": Blender.DEFAULT_BLEND_STRENGTH,
+        "blend_tile_size": TiledBlender.DEFAULT_TILE_SIZE,
+        "blend_tile_dir": TiledBlender.DEFAULT_TILE_DIR,
         "timelapse": Timelapser.DEFAULT_TIMELAPSE,
         "timelapse_prefix": Timelapser.DEFAULT_TIMELAPSE_PREFIX,
     }
@@ -60,14 +76,26 @@ class Stitcher:
         self.medium_megapix = args.medium_megapix
         self.low_megapix = args.low_megapix
         self.final_megapix = args.final_megapix
+        self.image_cache = ImagePyramidCache(
+            args.image_cache_size, args.image_cache_dir
+        )
+        self.image_loader = ImageLoader(args.loading_workers, args.reduced_decoding)
         if args.detector in ("orb", "sift"):
-            self.detector = FeatureDetector(args.detector, nfeatures=args.nfeatures)
+            self.detector = FeatureDetector(
+                args.detector, args.detection_workers, nfeatures=args.nfeatures
+            )
         else:
-            self.detector = FeatureDetector(args.detector)
+            self.detector = FeatureDetector(args.detector, args.detection_workers)
+        self.feature_cache = FeatureCache(
+            args.feature_cache_dir, args.feature_cache_size
+        )
         match_conf = FeatureMatcher.get_match_conf(args.match_conf, args.detector)
         self.matcher = FeatureMatcher(
             args.matcher_type,
             args.range_width,
+            args.loop_closures,
+            args.match_candidates,
+            args.matching_workers,
             try_use_gpu=args.try_use_gpu,
             match_conf=match_conf,
         )
@@ -85,15 +113,40 @@ class Stitcher:
             args.compensator, args.nr_feeds, args.block_size
         )
         self.seam_finder = SeamFinder(args.finder)
-        self.blender = Blender(args.blender_type, args.blend_strength)
+        if args.blend_tile_size:
+            self.blender = TiledBlender(
+                args.blender_type,
+                args.blend_strength,
+                args.blend_tile_size,
+                args.blend_tile_dir,
+            )
+        else:
+            self.blender = Blender(args.blender_type, args.blend_strength)
         self.timelapser = Timelapser(args.timelapse, args.timelapse_prefix)
 
     def stitch_verbose(self, images, feature_masks=[], verbose_dir=None):
         return verbose_stitching(self, images, feature_masks, verbose_dir)
 
     def stitch(self, images, feature_masks=[]):
+        cameras, seam_masks = self.estimate_panorama(images, feature_masks)
+        return self.compose_panorama(cameras, seam_masks)
+
+    def estimate_panorama(self, images, feature_masks=[]):
+        """Register the images and find the seams on the medium and low resolution.
+
+        Together with compose_panorama this is the two-step form of stitch(),
+        which allows to replace the final resolution images in between, e.g.
+        by upscaled versions of the images that survived the subsetting.
+
+        Returns the cameras and the seam masks for compose_panorama.
+        """
         self.images = Images.of(
-            images, self.medium_megapix, self.low_megapix, self.final_megapix
+            images,
+            self.medium_megapix,
+            self.low_megapix,
+            self.final_megapix,
+            self.image_cache,
+            self.image_loader,
         )
 
         imgs = self.resize_medium_resolution()
@@ -113,8 +166,15 @@ class Stitcher:
         )
         self.estimate_exposure_errors(corners, imgs, masks)
         seam_masks = self.find_seam_masks(imgs, corners, masks)
+        return cameras, seam_masks
+
+    def compose_panorama(self, cameras, seam_masks, imgs=None):
+        """Warp, crop and blend the final resolution images.
 
-        imgs = self.resize_final_resolution()
+        imgs replaces the (subsetted) input images if given. Their sizes must
+        match the final resolution, see Images.scale_resolution.
+        """
+        imgs = self.resize_final_resolution(imgs)
         imgs, masks, corners, sizes = self.warp_final_resolution(imgs, cameras)
         imgs, masks, corners, sizes = self.crop_final_resolution(
             imgs, masks, corners, sizes
@@ -132,7 +192,7 @@ class Stitcher:
 
     def find_features(self, imgs, feature_masks=[]):
         if len(feature_masks) == 0:
-            return self.detector.detect(imgs)
+            return self.feature_cache.detect(self.detector, imgs, self.medium_megapix)
         else:
             feature_masks = Images.of(
                 feature_masks, self.medium_megapix, self.low_megapix, self.final_megapix
@@ -213,8 +273,41 @@ class Stitcher:
     def find_seam_masks(self, imgs, corners, masks):
         return self.seam_finder.find(imgs, corners, masks)
 
-    def resize_final_resolution(self):
-        return self.images.resize(Images.Resolution.FINAL)
+    def resize_final_resolution(self, imgs=None):
+        return self.images.resize(Images.Resolution.FINAL, imgs)
+
+    def get_source_regions(self, cameras):
+        """Regions of the (subsetted) input images which end up in the panorama.
+
+        Without cropping these are the whole images, otherwise the part of each
+        image which is mapped into the largest interior rectangle.
+
+        Returns a Rectangle in original image coordinates for each image.
+        """
+        regions = []
+        sizes = self.images.get_scaled_img_sizes(Images.Resolution.LOW)
+        aspect = self.images.get_ratio(Images.Resolution.MEDIUM, Images.Resolution.LOW)
+        for idx, (size, original_size, camera) in enumerate(
+            zip(sizes, self.images.sizes, cameras)
+        ):
+            if not self.cropper.do_crop:
+                regions.append(Rectangle(0, 0, *original_size))
+                continue
+            # warp the pixel coordinates and look up those within the crop
+            x, y = np.meshgrid(
+                np.arange(size[0], dtype=np.float32),
+                np.arange(size[1], dtype=np.float32),
+            )
+            coordinates = self.warper.warp_image(np.dstack((x, y)), camera, aspect)
+            coordinates = self.cropper.crop_img(coordinates, idx)
+            x1, y1 = np.floor(coordinates.min(axis=(0, 1))).astype(int)
+            x2, y2 = np.ceil(coordinates.max(axis=(0, 1))).astype(int)
+            # one low resolution pixel of margin for the interpolation
+            region = Rectangle(x1 - 1, y1 - 1, x2 - x1 + 3, y2 - y1 + 3).times(
+                original_size[0] / size[0]
+            )
+            regions.append(Cropper.get_overlap(region, Rectangle(0, 0, *original_size)))
+        return regions
 
     def compensate_exposure_errors(self, corners, imgs):
         for idx, (corner, img) in enumerate(zip(corners, imgs)):
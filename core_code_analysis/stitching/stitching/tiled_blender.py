@@ -0,0 +1,158 @@
+import math
+import os
+import shutil
+import tempfile
+import weakref
+
+import cv2 as cv
+import numpy as np
+
+from .blender import Blender
+from .cropper import Rectangle
+
+
+class TiledBlender:
+    """Blender for panoramas which do not fit into memory.
+
+    The fed images and masks are spilled to memory-mapped files. blend()
+    partitions the panorama into tiles of tile_size x tile_size pixels and
+    blends each tile, extended by a margin of MARGIN_FACTOR times the blend
+    width, with its own Blender which is only fed the overlapping parts of
+    the images. The number of bands (multiband) and the sharpness (feather)
+    are derived from the whole panorama like in the Blender. The tiles are
+    written to a memory-mapped result, so the peak memory is proportional to
+    the tile size and not to the panorama size.
+
+    The files are written to a temporary directory (inside tile_dir if given)
+    which is removed with the blender. The returned panorama and mask are
+    numpy memmaps of the files in this directory."""
+
+    DEFAULT_TILE_SIZE = None
+    DEFAULT_TILE_DIR = None
+    MARGIN_FACTOR = 2
+
+    def __init__(
+        self,
+        blender_type=Blender.DEFAULT_BLENDER,
+        blend_strength=Blender.DEFAULT_BLEND_STRENGTH,
+        tile_size=2048,
+        tile_dir=DEFAULT_TILE_DIR,
+    ):
+        self.blender_type = blender_type
+        self.blend_strength = blend_strength
+        self.tile_size = tile_size
+        self.tile_dir = tile_dir
+        self.path = None
+
+    def prepare(self, corners, sizes):
+        self.dst_roi = Rectangle(*cv.detail.resultRoi(corners=corners, sizes=sizes))
+        self.blend_width = Blender(
+            self.blender_type, self.blend_strength
+        ).get_blend_width(tuple(self.dst_roi))
+        self.margin = math.ceil(self.MARGIN_FACTOR * self.blend_width)
+        self.rois = []
+        self.files = []
+        self.create_dir()
+
+    def create_dir(self):
+        if self.path is not None:
+            self.finalizer()
+        if self.tile_dir is not None:
+            os.makedirs(self.tile_dir, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix="stitching_tiles_", dir=self.tile_dir)
+        self.finalizer = weakref.finalize(
+            self, shutil.rmtree, self.path, ignore_errors=True
+        )
+
+    def feed(self, img, mask, corner):
+        idx = len(self.files)
+        img_file = self.spill(f"img{idx}", img)
+        mask_file = self.spill(f"mask{idx}", mask)
+        height, width = img.shape[:2]
+        self.rois.append(Rectangle(*corner, width, height))
+        self.files.append((img_file, mask_file))
+
+    def spill(self, name, array):
+        if isinstance(array, cv.UMat):
+            array = array.get()
+        path = os.path.join(self.path, name + ".npy")
+        spilled = np.lib.format.open_memmap(
+            path, mode="w+", dtype=array.dtype, shape=array.shape
+        )
+        spilled[:] = array
+        spilled.flush()
+        del spilled
+        return path
+
+    def blend(self):
+        x, y, width, height = self.dst_roi
+        result = np.lib.format.open_memmap(
+            os.path.join(self.path, "panorama.npy"),
+            mode="w+",
+            dtype=np.uint8,
+            shape=(height, width, 3),
+        )
+        result_mask = np.lib.format.open_memmap(
+            os.path.join(self.path, "panorama_mask.npy"),
+            mode="w+",
+            dtype=np.uint8,
+            shape=(height, width),
+        )
+        for tile in self.get_tiles():
+            blended = self.blend_tile(tile)
+            if blended is None:
+                continue
+            tile_result, tile_mask, tile_roi = blended
+            src = np.s_[
+                tile.y - tile_roi.y : tile.y2 - tile_roi.y,
+                tile.x - tile_roi.x : tile.x2 - tile_roi.x,
+            ]
+            dst = np.s_[tile.y - y : tile.y2 - y, tile.x - x : tile.x2 - x]
+            result[dst] = tile_result[src]
+            result_mask[dst] = tile_mask[src]
+        result.flush()
+        result_mask.flush()
+        return result, result_mask
+
+    def get_tiles(self):
+        x, y, width, height = self.dst_roi
+        for tile_y in range(y, y + height, self.tile_size):
+            for tile_x in range(x, x + width, self.tile_size):
+                yield Rectangle(
+                    tile_x,
+                    tile_y,
+                    min(self.tile_size, x + width - tile_x),
+                    min(self.tile_size, y + height - tile_y),
+                )
+
+    def blend_tile(self, tile):
+        """Blend the tile extended by the margin, None if no image overlaps it"""
+        x1 = max(tile.x - self.margin, self.dst_roi.x)
+        y1 = max(tile.y - self.margin, self.dst_roi.y)
+        x2 = min(tile.x2 + self.margin, self.dst_roi.x2)
+        y2 = min(tile.y2 + self.margin, self.dst_roi.y2)
+        tile_roi = Rectangle(x1, y1, x2 - x1, y2 - y1)
+
+        blender = None
+        for roi, (img_file, mask_file) in zip(self.rois, self.files):
+            overlap_x1, overlap_y1 = max(roi.x, x1), max(roi.y, y1)
+            overlap_x2, overlap_y2 = min(roi.x2, x2), min(roi.y2, y2)
+            if overlap_x1 >= overlap_x2 or overlap_y1 >= overlap_y2:
+                continue
+            crop = np.s_[
+                overlap_y1 - roi.y : overlap_y2 - roi.y,
+                overlap_x1 - roi.x : overlap_x2 - roi.x,
+            ]
+            mask = np.ascontiguousarray(np.load(mask_file, mmap_mode="r")[crop])
+            if not mask.any():
+                continue
+            img = np.ascontiguousarray(np.load(img_file, mmap_mode="r")[crop])
+            if blender is None:
+                blender = Blender(self.blender_type, self.blend_strength)
+                blender.prepare_roi(tuple(tile_roi), self.blend_width)
+            blender.feed(img, mask, (overlap_x1, overlap_y1))
+
+        if blender is None:
+            return None
+        result, result_mask = blender.blend()
+        return result, result_mask, tile_roi
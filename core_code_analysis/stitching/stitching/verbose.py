@@ -14,7 +14,12 @@ def verbose_stitching(stitcher, images, feature_masks=[], verbose_dir=None):
         file.write(type(stitcher).__name__ + "(**" + str(stitcher.kwargs) + ")")
 
     images = Images.of(
-        images, stitcher.medium_megapix, stitcher.low_megapix, stitcher.final_megapix
+        images,
+        stitcher.medium_megapix,
+        stitcher.low_megapix,
+        stitcher.final_megapix,
+        stitcher.image_cache,
+        stitcher.image_loader,
     )
 
     # Resize Images
@@ -15,9 +15,17 @@ from stitching.cropper import Cropper  # noqa: F401, E402
 from stitching.exposure_error_compensator import (  # noqa: F401, E402
     ExposureErrorCompensator,
 )
+from stitching.feature_cache import FeatureCache  # noqa: F401, E402
 from stitching.feature_detector import FeatureDetector  # noqa: F401, E402
 from stitching.feature_matcher import FeatureMatcher  # noqa: F401, E402
-from stitching.images import Images, _FilenameImages, _NumpyImages  # noqa: F401, E402
+from stitching.incremental_stitcher import IncrementalStitcher  # noqa: F401, E402
+from stitching.images import (  # noqa: F401, E402
+    ImageLoader,
+    ImagePyramidCache,
+    Images,
+    _FilenameImages,
+    _NumpyImages,
+)
 from stitching.megapix_scaler import (  # noqa: F401, E402
     MegapixDownscaler,
     MegapixScaler,
@@ -28,6 +36,7 @@ from stitching.stitching_error import (  # noqa: F401, E402
     StitchingWarning,
 )
 from stitching.subsetter import Subsetter  # noqa: F401, E402
+from stitching.tiled_blender import TiledBlender  # noqa: F401, E402
 from stitching.timelapser import Timelapser  # noqa: F401, E402
 from stitching.warper import Warper  # noqa: F401, E402
 
@@ -19,6 +19,17 @@ class TestFeatureDetector(unittest.TestCase):
         features = detector.detect_features(img1)
         self.assertEqual(len(features.getKeypoints()), other_keypoints)
 
+    def test_parallel_detection(self):
+        imgs = [load_test_img("s1.jpg"), load_test_img("s2.jpg")]
+
+        features = FeatureDetector("orb").detect(imgs)
+        parallel_features = FeatureDetector("orb", workers=2).detect(imgs)
+        self.assertEqual(len(parallel_features), len(imgs))
+        for feature, parallel_feature in zip(features, parallel_features):
+            np.testing.assert_array_equal(
+                feature.descriptors.get(), parallel_feature.descriptors.get()
+            )
+
     def test_feature_masking(self):
         img1 = load_test_img("s1.jpg")
 
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from .context import FeatureCache, FeatureDetector, load_test_img
+
+
+class TestFeatureCache(unittest.TestCase):
+    def test_cached_features(self):
+        imgs = [load_test_img("s1.jpg"), load_test_img("s2.jpg")]
+        detector = FeatureDetector("orb")
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = FeatureCache(cache_dir)
+            features = cache.detect(detector, imgs)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+            cached_features = cache.detect(detector, imgs)
+            for feature, cached_feature in zip(features, cached_features):
+                self.assertEqual(feature.img_size, cached_feature.img_size)
+                np.testing.assert_array_equal(
+                    cv_points(feature), cv_points(cached_feature)
+                )
+                np.testing.assert_array_equal(
+                    feature.descriptors.get(), cached_feature.descriptors.get()
+                )
+
+            # other detector settings must not hit the cache
+            other_detector = FeatureDetector("orb", nfeatures=1000)
+            cache.detect(other_detector, imgs)
+            self.assertEqual(len(os.listdir(cache_dir)), 4)
+
+    def test_eviction(self):
+        imgs = [load_test_img("s1.jpg"), load_test_img("s2.jpg")]
+        detector = FeatureDetector("orb")
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            FeatureCache(cache_dir).detect(detector, imgs)
+            entry_size = max(
+                os.path.getsize(os.path.join(cache_dir, name))
+                for name in os.listdir(cache_dir)
+            )
+            cache = FeatureCache(cache_dir, max_size=entry_size / 1024**2)
+            cache.evict()
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+    def test_disabled_cache(self):
+        cache = FeatureCache()
+        self.assertFalse(cache.enabled)
+        features = cache.detect(FeatureDetector("orb"), [load_test_img("s1.jpg")])
+        self.assertEqual(len(features), 1)
+
+
+def cv_points(features):
+    return np.array([keypoint.pt for keypoint in features.getKeypoints()])
+
+
+def starttest():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    starttest()
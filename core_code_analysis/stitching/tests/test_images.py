@@ -1,8 +1,20 @@
+import os
+import tempfile
 import unittest
+from unittest.mock import patch
 
+import cv2 as cv
 import numpy as np
 
-from .context import Images, _FilenameImages, _NumpyImages, load_test_img, test_input
+from .context import (
+    ImageLoader,
+    ImagePyramidCache,
+    Images,
+    _FilenameImages,
+    _NumpyImages,
+    load_test_img,
+    test_input,
+)
 
 
 class TestImages(unittest.TestCase):
@@ -41,6 +53,79 @@ class TestImages(unittest.TestCase):
         ratio = images.get_ratio(Images.Resolution.MEDIUM, Images.Resolution.LOW)
         self.assertEqual(ratio, 0.408248290463863)
 
+    def test_pyramid_cache(self):
+        names = [test_input("s1.jpg"), test_input("s2.jpg")]
+        uncached = Images.of(names)
+        expected = {
+            resolution: list(uncached.resize(resolution))
+            for resolution in Images.Resolution
+        }
+        # like in the stitcher, the low resolution is derived from the medium one
+        expected[Images.Resolution.LOW] = list(
+            uncached.resize(Images.Resolution.LOW, expected[Images.Resolution.MEDIUM])
+        )
+
+        # a budget of ~1 pyramid spills the least recently used one to disk
+        with tempfile.TemporaryDirectory() as spill_dir:
+            cache = ImagePyramidCache(6, spill_dir)
+            with patch.object(
+                Images, "read_image", wraps=Images.read_image
+            ) as read_image:
+                for _ in range(2):
+                    images = Images.of(names, cache=cache)
+                    for resolution in Images.Resolution:
+                        imgs = list(images.resize(resolution))
+                        for img, expected_img in zip(imgs, expected[resolution]):
+                            np.testing.assert_array_equal(img, expected_img)
+                    np.testing.assert_array_equal(images.sizes, uncached.sizes)
+                self.assertEqual(read_image.call_count, 2)
+            self.assertEqual(len(cache._memory), 1)
+            self.assertEqual(len(cache._spilled), 1)
+
+            # scaled resolutions are not served from the cache
+            images.scale_resolution(Images.Resolution.FINAL, 0.5)
+            imgs = list(images.resize(Images.Resolution.FINAL))
+            self.assertEqual(
+                [Images.get_image_size(img) for img in imgs],
+                images.get_scaled_img_sizes(Images.Resolution.FINAL),
+            )
+            self.assertEqual(read_image.call_count, 2)
+            cache.clear()
+
+    def test_image_loader(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            names = []
+            for idx, size in enumerate([(1001, 603), (640, 480), (97, 55)]):
+                names.append(os.path.join(tmp_dir, f"{idx}.jpg"))
+                img = np.random.randint(0, 255, (size[1], size[0], 3), np.uint8)
+                cv.imwrite(names[-1], img)
+            png = os.path.join(tmp_dir, "img.png")
+            cv.imwrite(png, img)
+
+            self.assertEqual(Images.read_jpeg_size(names[0]), (1001, 603))
+            self.assertIsNone(Images.read_jpeg_size(png))
+
+            loader = ImageLoader(workers=3)
+            self.assertEqual(ImageLoader.get_reduction(0.3), 2)
+            self.assertEqual(ImageLoader.get_reduction(0.1), 8)
+            size, img = loader.read(names[0], 0.3)
+            self.assertEqual(size, (1001, 603))
+            self.assertEqual(Images.get_image_size(img), (501, 302))
+            size, img = loader.read(png, 0.3)
+            self.assertEqual(Images.get_image_size(img), (97, 55))
+
+            # the images are returned in order and with their original sizes
+            images = Images.of(names * 4, 0.1, 0.01, loader=loader)
+            imgs = list(images.resize(Images.Resolution.LOW))
+            self.assertEqual(
+                [Images.get_image_size(img) for img in imgs],
+                images.get_scaled_img_sizes(Images.Resolution.LOW),
+            )
+            self.assertEqual(images.sizes, [(1001, 603), (640, 480), (97, 55)] * 4)
+            self.assertEqual(
+                [Images.get_image_size(img) for img in images], images.sizes
+            )
+
     def test_images(self):
         self.assertEqual(Images.Resolution.LOW.name, "LOW")
         self.assertEqual(Images.Resolution.LOW.value, 0.1)
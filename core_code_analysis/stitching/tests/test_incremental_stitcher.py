@@ -0,0 +1,50 @@
+import unittest
+
+from .context import (
+    IncrementalStitcher,
+    Stitcher,
+    StitchingError,
+    load_test_img,
+    write_test_result,
+)
+
+
+class TestIncrementalStitcher(unittest.TestCase):
+    def test_incremental_stitching(self):
+        imgs = [load_test_img(f"budapest{i}.jpg") for i in range(1, 5)]
+        stitcher = IncrementalStitcher(final_megapix=0.3)
+
+        self.assertIsNone(stitcher.add(imgs[:1]))
+        panorama = stitcher.add(imgs[1:3])
+        known_cameras = {idx: camera.R for idx, camera in stitcher.cameras.items()}
+        extended_panorama = stitcher.add(imgs[3:])
+        write_test_result("incremental_budapest.jpg", extended_panorama)
+
+        self.assertEqual(len(stitcher.features), 4)
+        self.assertEqual(len(stitcher.pairwise_matches), 16)
+        self.assertEqual(stitcher.composed, {0, 1, 2, 3})
+        self.assertGreaterEqual(extended_panorama.shape[0], panorama.shape[0])
+        self.assertGreater(extended_panorama.shape[1], panorama.shape[1])
+        # the cameras of the composed images are kept
+        for idx, R in known_cameras.items():
+            self.assertTrue((stitcher.cameras[idx].R == R).all())
+
+        # the result is comparable to stitching all images at once
+        full_panorama = Stitcher(crop=False, final_megapix=0.3).stitch(imgs)
+        self.assertAlmostEqual(
+            extended_panorama.shape[1], full_panorama.shape[1], delta=50
+        )
+
+    def test_unsupported_settings(self):
+        with self.assertRaises(StitchingError):
+            IncrementalStitcher(crop=True)
+        with self.assertRaises(StitchingError):
+            IncrementalStitcher().add(["budapest1.jpg", "budapest2.jpg"])
+
+
+def start_test():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    start_test()
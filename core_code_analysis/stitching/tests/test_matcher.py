@@ -1,8 +1,9 @@
 import unittest
 
+import cv2 as cv
 import numpy as np
 
-from .context import FeatureMatcher
+from .context import FeatureDetector, FeatureMatcher, Subsetter, load_test_img
 
 
 class TestMatcher(unittest.TestCase):
@@ -31,6 +32,60 @@ class TestMatcher(unittest.TestCase):
         self.assertEqual(implicit_match_conf_orb, 0.3)
         self.assertEqual(implicit_match_conf_other, 0.65)
 
+    def test_retrieval_match_mask(self):
+        imgs = [load_test_img(f"weir_{i}.jpg") for i in (1, 2, 3)]
+        imgs += [load_test_img("s1.jpg"), load_test_img("s2.jpg")]
+        features = FeatureDetector("orb").detect(imgs)
+
+        mask = FeatureMatcher.get_retrieval_match_mask(features, 1)
+
+        self.assertEqual(mask.shape, (5, 5))
+        np.testing.assert_array_equal(mask, np.triu(mask, k=1))
+        # every image is part of at least one candidate pair
+        self.assertTrue(np.all((mask | mask.T).sum(axis=1) >= 1))
+        self.assertLessEqual(mask.sum(), 5)
+
+        global_descriptors = FeatureMatcher.get_global_descriptors(features)
+        np.testing.assert_allclose(np.linalg.norm(global_descriptors, axis=1), 1)
+        cv.setRNGSeed(42)
+        np.testing.assert_array_equal(
+            FeatureMatcher.get_global_descriptors(features), global_descriptors
+        )
+
+    def test_parallel_matching(self):
+        imgs = [load_test_img(f"weir_{i}.jpg") for i in (1, 2, 3)]
+        features = FeatureDetector("orb").detect(imgs)
+
+        for settings in ({}, {"range_width": 1}, {"matcher_type": "affine"}):
+            matches = FeatureMatcher(**settings).match_features(features)
+            parallel_matches = FeatureMatcher(workers=2, **settings).match_features(
+                features
+            )
+            self.assertEqual(len(parallel_matches), len(matches))
+            for match, parallel_match in zip(matches, parallel_matches):
+                self.assertEqual(match.src_img_idx, parallel_match.src_img_idx)
+                self.assertEqual(match.dst_img_idx, parallel_match.dst_img_idx)
+
+    def test_flann_matcher(self):
+        imgs = [load_test_img(f"weir_{i}.jpg") for i in (1, 2, 3)]
+
+        for detector in ("orb", "sift"):
+            features = FeatureDetector(detector).detect(imgs)
+            matcher = FeatureMatcher("flann", match_conf=0.5)
+            pairwise_matches = matcher.match_features(features)
+
+            self.assertEqual(len(pairwise_matches), 9)
+            matches_matrix = FeatureMatcher.get_matches_matrix(pairwise_matches)
+            for idx1, idx2 in FeatureMatcher.get_all_img_combinations(3):
+                match = matches_matrix[idx1, idx2]
+                dual_match = matches_matrix[idx2, idx1]
+                self.assertEqual((match.src_img_idx, match.dst_img_idx), (idx1, idx2))
+                self.assertEqual(match.confidence, dual_match.confidence)
+                self.assertEqual(len(match.matches), len(dual_match.matches))
+
+            # the matches must be usable by OpenCV
+            Subsetter(0).get_indices_to_keep(features, pairwise_matches)
+
 
 def start_test():
     unittest.main()
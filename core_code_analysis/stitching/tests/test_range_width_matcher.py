@@ -34,6 +34,32 @@ class TestRangeMatcher(unittest.TestCase):
             )
         )
 
+    def test_sequential_match_mask(self):
+        mask = FeatureMatcher.get_sequential_match_mask(6, 1, loop_closures=2)
+        ii, jj = np.nonzero(mask)
+        expected = [(0, 1), (0, 2), (0, 4), (1, 2), (1, 3), (1, 5), (2, 3)]
+        expected += [(2, 4), (3, 4), (3, 5), (4, 5)]
+        self.assertEqual(list(zip(ii, jj)), expected)
+
+    def test_loop_closure_matcher(self):
+        img1 = load_test_img("weir_1.jpg")
+        img2 = load_test_img("weir_2.jpg")
+        img3 = load_test_img("weir_3.jpg")
+
+        detector = FeatureDetector("orb")
+        features = [detector.detect_features(img) for img in [img1, img2, img3]]
+
+        for matcher_type in FeatureMatcher.MATCHER_CHOICES:
+            matcher = FeatureMatcher(matcher_type, range_width=1)
+            pairwise_matches = matcher.match_features(features)
+            conf_matrix = FeatureMatcher.get_confidence_matrix(pairwise_matches)
+            self.assertEqual(conf_matrix[0, 2], 0)
+
+            matcher = FeatureMatcher(matcher_type, range_width=1, loop_closures=1)
+            pairwise_matches = matcher.match_features(features)
+            conf_matrix = FeatureMatcher.get_confidence_matrix(pairwise_matches)
+            self.assertGreater(conf_matrix[0, 2], 0)
+
     def test_matches_graph_issue56(self):
         settings = {
             "range_width": 1,
@@ -2,11 +2,13 @@ import os
 import unittest
 from datetime import datetime
 
+import cv2 as cv
 import numpy as np
 
 from .context import (
     VERBOSE_DIR,
     AffineStitcher,
+    Images,
     Stitcher,
     StitchingError,
     StitchingWarning,
@@ -80,6 +82,27 @@ class TestStitcher(unittest.TestCase):
 
         self.stitch_test(stitcher, imgs, expected_shape, max_derivation, name)
 
+    def test_stitcher_with_upscaled_final_images(self):
+        stitcher = Stitcher(nfeatures=250)
+        imgs = [load_test_img("s1.jpg"), load_test_img("s2.jpg")]
+        expected_shape = np.array(stitcher.stitch(imgs).shape[:2]) * 2
+        max_derivation = 10
+
+        cameras, seam_masks = stitcher.estimate_panorama(imgs)
+        regions = stitcher.get_source_regions(cameras)
+        for region, img in zip(regions, stitcher.images):
+            self.assertGreater(region.area, 0)
+            self.assertLessEqual(region.x2, img.shape[1])
+            self.assertLessEqual(region.y2, img.shape[0])
+
+        upscaled = [cv.resize(img, None, fx=2, fy=2) for img in stitcher.images]
+        stitcher.images.scale_resolution(Images.Resolution.FINAL, 2)
+        result = stitcher.compose_panorama(cameras, seam_masks, upscaled)
+
+        np.testing.assert_allclose(
+            result.shape[:2], expected_shape, atol=max_derivation
+        )
+
     def test_stitcher_boat1(self):
         settings = {
             "warper_type": "fisheye",
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+import cv2 as cv
+import numpy as np
+
+from .context import Blender, TiledBlender
+
+
+class TestTiledBlender(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.imgs, self.masks = [], []
+        self.corners = [(-20, 5), (150, 0), (310, 30)]
+        for _ in self.corners:
+            img = cv.GaussianBlur(
+                rng.integers(0, 255, (240, 320, 3), np.uint8), (0, 0), 5
+            )
+            mask = np.full((240, 320), 255, np.uint8)
+            mask[:10, :40] = 0
+            self.imgs.append(img)
+            self.masks.append(mask)
+        self.sizes = [(img.shape[1], img.shape[0]) for img in self.imgs]
+
+    def blend(self, blender):
+        blender.prepare(self.corners, self.sizes)
+        for img, mask, corner in zip(self.imgs, self.masks, self.corners):
+            blender.feed(img, mask, corner)
+        return blender.blend()
+
+    def test_tiled_blending(self):
+        with tempfile.TemporaryDirectory() as tile_dir:
+            for blender_type in Blender.BLENDER_CHOICES:
+                result, result_mask = self.blend(Blender(blender_type))
+                tiled_blender = TiledBlender(
+                    blender_type, tile_size=64, tile_dir=tile_dir
+                )
+                tiled, tiled_mask = self.blend(tiled_blender)
+
+                self.assertEqual(tiled.shape, result.shape)
+                np.testing.assert_array_equal(tiled_mask, result_mask)
+                difference = np.abs(tiled.astype(int) - result)
+                if blender_type == "multiband":
+                    # the pyramids of the tiles differ slightly at the borders
+                    self.assertLess(difference.mean(), 1)
+                else:
+                    self.assertEqual(difference.max(), 0)
+
+                self.assertTrue(os.listdir(tile_dir))
+                tiled_blender.finalizer()
+                self.assertFalse(os.listdir(tile_dir))
+
+
+def start_test():
+    unittest.main()
+
+
+if __name__ == "__main__":
+    start_test()
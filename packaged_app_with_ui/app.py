@@ -16,6 +16,9 @@ import panorama_stitcher
 # Store all created temporary directories for cleanup on exit
 TEMP_DIRS = []
 
+# Super-resolution model selected by default and loaded at startup
+DEFAULT_MODEL = "RealESRGAN_x2plus"
+
 
 def cleanup_temp_dirs():
     """Clean up all temporary directories"""
@@ -37,9 +40,13 @@ atexit.register(cleanup_temp_dirs)
 def process_video_to_panorama(
     video_path,
     frame_skip,
+    sharpest,
+    adaptive_selection,
     enhance_enabled,
     model_name,
     outscale,
+    sr_stage,
+    save_frames,
     crop,
     detector,
     confidence_threshold,
@@ -60,12 +67,21 @@ def process_video_to_panorama(
     # Step 1: Extract frames
     progress(0, desc="Preparing to process video...")
 
+    # Enhance only the regions that end up in the panorama after registration,
+    # or the finished panorama, instead of every extracted frame
+    enhance_regions = enhance_enabled and sr_stage == "regions"
+    enhance_result = enhance_enabled and sr_stage == "panorama"
+
     # Process video parameter settings
     params = {
         "frame_skip": frame_skip,
-        "enhance": enhance_enabled,
+        "sharpest": sharpest,
+        "keyframe_overlap": 0.4 if adaptive_selection else None,
+        "enhance": enhance_enabled and sr_stage == "frames",
         "model_name": model_name,
         "outscale": outscale,
+        "in_memory": True,
+        "save_frames": save_frames,
     }
 
     # Process video
@@ -81,9 +97,6 @@ def process_video_to_panorama(
     if result["frames_count"] == 0:
         return None
 
-    # Get enhanced frames directory or original frames directory
-    frames_dir = result.get("enhanced_dir", result["frames_dir"])
-
     # Step 2: Stitch panorama
     progress(0.7, desc="Stitching panorama...")
     output_path = os.path.join(work_dir, "panorama.jpg")
@@ -108,16 +121,51 @@ def process_video_to_panorama(
     panorama_settings["detector"] = detector if detector else "sift"
     panorama_settings["estimator"] = estimator if estimator else "homography"
 
-    # Stitch panorama
-    panorama = panorama_stitcher.create_panorama(
-        input_dir=frames_dir,
-        output_file=output_path,
-        settings=panorama_settings,
-        callback=lambda msg: progress(0.8, desc=msg),
-        interim_callback=lambda img, curr, total: progress(
-            0.7 + 0.3 * curr / total, desc=f"Stitching progress: {curr}/{total}"
-        ),
-    )
+    def stitch_callback(msg, prog=None):
+        progress(0.8, desc=msg)
+
+    def interim_callback(img, curr, total):
+        progress(0.7 + 0.3 * curr / total, desc=f"Stitching progress: {curr}/{total}")
+
+    if enhance_regions:
+        # Register raw frames first, then enhance only what survives
+        upsampler, plan = frame_processor.load_enhancer(
+            params, callback=stitch_callback
+        )
+        panorama = panorama_stitcher.create_enhanced_panorama(
+            frames=result["frames"],
+            output_file=output_path,
+            enhance=lambda frames, regions: frame_processor.enhance_frame_regions(
+                frames, regions, upsampler, outscale=outscale, prescale=plan["prescale"]
+            ),
+            outscale=outscale,
+            settings=panorama_settings,
+            callback=stitch_callback,
+            interim_callback=interim_callback,
+        )
+    else:
+        # Stitch panorama straight from the in-memory frames
+        panorama = panorama_stitcher.create_panorama_from_frames(
+            frames=result["frames"],
+            output_file=output_path,
+            settings=panorama_settings,
+            callback=stitch_callback,
+            interim_callback=interim_callback,
+        )
+
+    if enhance_result and panorama is not None:
+        # Super-resolve the raw panorama tile by tile into a disk-backed array
+        upsampler, plan = frame_processor.load_enhancer(
+            params, callback=stitch_callback
+        )
+        panorama = frame_processor.enhance_panorama(
+            panorama,
+            upsampler,
+            outscale=outscale,
+            prescale=plan["prescale"],
+            output_path=os.path.join(work_dir, "panorama_enhanced.npy"),
+            callback=stitch_callback,
+        )
 
     progress(1.0, desc="Processing complete!")
 
@@ -170,6 +218,16 @@ def create_ui():
                     step=1,
                     label="Frame Skip (higher = faster processing but less detail)",
                 )
+                sharpest = gr.Checkbox(
+                    label="Pick Sharpest Frame per Interval",
+                    value=False,
+                    info="Skips blurry and duplicate frames before enhancement",
+                )
+                adaptive_selection = gr.Checkbox(
+                    label="Motion-Adaptive Frame Selection",
+                    value=False,
+                    info="Only keep frames once the camera has moved far enough",
+                )
 
                 # Super-resolution settings
                 with gr.Accordion("Super-Resolution Settings", open=True):
@@ -178,7 +236,7 @@ def create_ui():
                     )
                     model_name = gr.Dropdown(
                         choices=get_available_models(),
-                        value="RealESRGAN_x2plus",
+                        value=DEFAULT_MODEL,
                         label="Super-Resolution Model",
                     )
                     outscale = gr.Slider(
@@ -188,6 +246,16 @@ def create_ui():
                         step=1,
                         label="Output Scale Factor",
                     )
+                    sr_stage = gr.Radio(
+                        choices=["regions", "frames", "panorama"],
+                        value="regions",
+                        label="Super-Resolution Stage",
+                        info="regions: only enhance the parts of the frames used in the panorama; frames: enhance every extracted frame; panorama: enhance the stitched panorama tile by tile",
+                    )
+
+                save_frames = gr.Checkbox(
+                    label="Save Intermediate Frames to Disk", value=False
+                )
 
                 # Panorama settings
                 with gr.Accordion("Panorama Stitching Settings", open=True):
@@ -219,9 +287,13 @@ def create_ui():
             inputs=[
                 video_input,
                 frame_skip,
+                sharpest,
+                adaptive_selection,
                 enhance_enabled,
                 model_name,
                 outscale,
+                sr_stage,
+                save_frames,
                 crop,
                 detector,
                 confidence_threshold,
@@ -242,8 +314,11 @@ def create_ui():
                 5. Click "Process Video" button to start processing
                 
                 ### Execution Flow
-                - The system extracts video frames to a temporary folder
-                - If super-resolution is enabled, all extracted frames are enhanced
+                - The system extracts video frames and keeps them in memory
+                  (optionally also saving them to a temporary folder)
+                - If super-resolution is enabled, the raw frames are registered first and
+                  only the parts that end up in the panorama are enhanced
+                  (or all extracted frames, or the stitched panorama, depending on the stage)
                 - Finally, all frames are stitched together to create a panorama
                 
                 ### Notes
@@ -260,9 +335,13 @@ def create_ui():
                     [
                         "example_video.mp4",
                         5,
+                        False,
+                        False,
                         True,
                         "RealESRGAN_x4plus",
                         2,
+                        "regions",
+                        False,
                         True,
                         "sift",
                         "0.05",
@@ -272,9 +351,13 @@ def create_ui():
                 inputs=[
                     video_input,
                     frame_skip,
+                    sharpest,
+                    adaptive_selection,
                     enhance_enabled,
                     model_name,
                     outscale,
+                    sr_stage,
+                    save_frames,
                     crop,
                     detector,
                     confidence_threshold,
@@ -286,5 +369,7 @@ def create_ui():
 
 
 if __name__ == "__main__":
+    # Load the default model once so the first click does not pay the load latency
+    frame_processor.warm_up_models([DEFAULT_MODEL], callback=print)
     app = create_ui()
     app.launch(share=False)
@@ -1,27 +1,75 @@
 import cv2
 import os
 import numpy as np
+import torch
 from basicsr.archs.rrdbnet_arch import RRDBNet
 from realesrgan import RealESRGANer
 from realesrgan.archs.srvgg_arch import SRVGGNetCompact
 from basicsr.utils.download_util import load_file_from_url
 import glob
+import threading
 import uuid
+from collections import OrderedDict
 
 
 # Define available model list
 AVAILABLE_MODELS = [
-    {"name": "RealESRGAN_x4plus", "description": "General model, 4x upscale"},
+    {
+        "name": "RealESRGAN_x4plus",
+        "description": "General model, 4x upscale",
+        "scale": 4,
+    },
     {
         "name": "RealESRGAN_x4plus_anime_6B",
         "description": "Anime model, 4x upscale, smaller",
+        "scale": 4,
+    },
+    {
+        "name": "RealESRGAN_x2plus",
+        "description": "General model, 2x upscale",
+        "scale": 2,
+    },
+    {
+        "name": "RealESRNet_x4plus",
+        "description": "Denoising model, 4x upscale",
+        "scale": 4,
+    },
+    {
+        "name": "realesr-animevideov3",
+        "description": "Anime video model, 4x upscale",
+        "scale": 4,
+    },
+    {
+        "name": "realesr-general-x4v3",
+        "description": "General video model, 4x upscale",
+        "scale": 4,
     },
-    {"name": "RealESRGAN_x2plus", "description": "General model, 2x upscale"},
-    {"name": "RealESRNet_x4plus", "description": "Denoising model, 4x upscale"},
-    {"name": "realesr-animevideov3", "description": "Anime video model, 4x upscale"},
-    {"name": "realesr-general-x4v3", "description": "General video model, 4x upscale"},
 ]
 
+# Models of the same family trained for another scale: model -> {scale: model}
+SCALE_VARIANTS = {
+    "RealESRGAN_x4plus": {2: "RealESRGAN_x2plus"},
+    "RealESRGAN_x2plus": {4: "RealESRGAN_x4plus"},
+}
+
+
+# Sampling gaps (in frames) from which seeking is cheaper than grabbing
+SEEK_THRESHOLD = 60
+
+# Width of the grayscale frames used for motion estimation
+MOTION_WIDTH = 256
+
+# Context (in input pixels) added around regions that are super-resolved
+REGION_PAD = 10
+
+# Size (in input pixels) of the tiles a finished panorama is enhanced in
+PANORAMA_TILE = 256
+
+# Process-wide LRU cache of loaded models: key -> (upsampler, size in bytes)
+MODEL_CACHE = OrderedDict()
+MODEL_CACHE_LOCK = threading.Lock()
+MODEL_CACHE_BUDGET = 4 * 1024**3
+
 
 def create_directory(dir_path):
     """Create directory if it doesn't exist"""
@@ -29,22 +77,17 @@ def create_directory(dir_path):
         os.makedirs(dir_path)
 
 
-def extract_frames(video_path, output_dir, frame_skip=1, callback=None):
+def open_video(video_path, callback=None):
     """
-    Extract frames from video
+    Open video file and report its metadata
 
     Parameters:
         video_path: Video file path
-        output_dir: Output directory
-        frame_skip: Frame interval
         callback: Callback function for progress updates
 
     Returns:
-        saved_count: Number of frames saved
+        tuple: (video, total_frames, fps), video is None if it cannot be opened
     """
-    create_directory(output_dir)
-
-    # Open video file
     if callback:
         callback(f"Opening video: {video_path}")
 
@@ -52,7 +95,7 @@ def extract_frames(video_path, output_dir, frame_skip=1, callback=None):
     if not video.isOpened():
         if callback:
             callback(f"Error: Unable to open video {video_path}")
-        return 0
+        return None, 0, 0
 
     # Get video information
     total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
@@ -63,30 +106,439 @@ def extract_frames(video_path, output_dir, frame_skip=1, callback=None):
         callback(
             f"Video info: Total frames={total_frames}, FPS={fps:.2f}, Duration={duration:.2f}s"
         )
-        callback(f"Starting frame extraction, interval={frame_skip}...")
 
-    count = 0
-    saved_count = 0
+    return video, total_frames, fps
 
-    while True:
-        success, frame = video.read()
-        if not success:
-            break
 
-        if count % frame_skip == 0:
-            frame_path = f"{output_dir}/frame_{count:04d}.jpg"
-            cv2.imwrite(frame_path, frame)
-            saved_count += 1
+def get_sample_step(fps, frame_skip=1, sample_interval=None):
+    """
+    Get the number of frames between two sampled frames
 
-            if callback and saved_count % 10 == 0:
-                progress = min(count / total_frames, 1.0) if total_frames > 0 else 0
-                callback(f"Saved {saved_count} frames", progress)
+    Parameters:
+        fps: Frame rate of the video
+        frame_skip: Frame interval
+        sample_interval: Time between two sampled frames in seconds,
+            overrides frame_skip if set and the frame rate is known
+
+    Returns:
+        step: Frame interval (at least 1)
+    """
+    if sample_interval and fps > 0:
+        return max(1, int(round(sample_interval * fps)))
+    return max(1, int(frame_skip))
+
+
+def seek_frame(video, frame_index):
+    """
+    Seek to a frame using the container index
+
+    Parameters:
+        video: cv2.VideoCapture instance
+        frame_index: Index of the frame that should be decoded next
+
+    Returns:
+        success: Whether the decoder is now positioned at frame_index
+    """
+    if not video.set(cv2.CAP_PROP_POS_FRAMES, frame_index):
+        return False
+    return int(video.get(cv2.CAP_PROP_POS_FRAMES)) == frame_index
+
+
+def iter_frames(
+    video_path,
+    frame_skip=1,
+    sample_interval=None,
+    seek_threshold=SEEK_THRESHOLD,
+    callback=None,
+):
+    """
+    Decode frames from video and yield every frame_skip-th frame
+
+    Skipped frames are only grabbed (demuxed and decoded, but neither
+    retrieved nor color converted). Gaps of at least seek_threshold frames
+    are bridged by seeking, which lets the decoder jump to the nearest
+    keyframe instead of decoding every frame in between.
+
+    Parameters:
+        video_path: Video file path
+        frame_skip: Frame interval
+        sample_interval: Time between two sampled frames in seconds,
+            overrides frame_skip if set
+        seek_threshold: Minimum gap (in frames) for which seeking is used,
+            0 disables seeking
+        callback: Callback function for progress updates
+
+    Yields:
+        tuple: (frame_index, frame) with frame as BGR numpy array
+    """
+    video, total_frames, fps = open_video(video_path, callback=callback)
+    if video is None:
+        return
+
+    step = get_sample_step(fps, frame_skip, sample_interval)
+    use_seek = seek_threshold > 0 and step >= seek_threshold and total_frames > 0
+
+    if callback:
+        callback(
+            f"Starting frame extraction, interval={step}"
+            f"{' (seeking)' if use_seek else ''}..."
+        )
+
+    position = 0
+    next_index = 0
+    yielded_count = 0
+
+    try:
+        while True:
+            gap = next_index - position
+            if use_seek and gap > 0 and next_index < total_frames:
+                if seek_frame(video, next_index):
+                    position = next_index
+                else:
+                    # Container does not support accurate seeking, fall back to grabbing
+                    use_seek = False
+                    if not seek_frame(video, position):
+                        # The decoder is left at an unknown frame, decode
+                        # again from the first frame so indices stay correct
+                        video.release()
+                        video = cv2.VideoCapture(video_path)
+                        if not video.isOpened():
+                            if callback:
+                                callback(f"Error: Unable to reopen video {video_path}")
+                            return
+                        position = 0
+
+            while position < next_index:
+                if not video.grab():
+                    return
+                position += 1
+
+            success, frame = video.read()
+            if not success:
+                break
+            position += 1
+
+            yield next_index, frame
+            yielded_count += 1
+            next_index += step
+
+            if callback and yielded_count % 10 == 0:
+                progress = min(next_index / total_frames, 1.0) if total_frames > 0 else 0
+                callback(f"Extracted {yielded_count} frames", progress)
+    finally:
+        video.release()
+
+
+def sample_frames(
+    video_path,
+    frame_skip=1,
+    sample_interval=None,
+    seek_threshold=SEEK_THRESHOLD,
+    sharpest=False,
+    callback=None,
+):
+    """
+    Sample frames from video, either at a fixed interval or picking the
+    sharpest frame of each interval
+
+    Parameters:
+        video_path: Video file path
+        frame_skip: Frame interval
+        sample_interval: Time between two sampled frames in seconds,
+            overrides frame_skip if set
+        seek_threshold: Minimum gap (in frames) for which seeking is used
+        sharpest: Decode every frame and keep the sharpest one per interval
+        callback: Callback function for progress updates
+
+    Yields:
+        tuple: (frame_index, frame)
+    """
+    if not sharpest:
+        yield from iter_frames(
+            video_path,
+            frame_skip=frame_skip,
+            sample_interval=sample_interval,
+            seek_threshold=seek_threshold,
+            callback=callback,
+        )
+        return
+
+    fps = 0
+    if sample_interval:
+        video = cv2.VideoCapture(video_path)
+        fps = video.get(cv2.CAP_PROP_FPS)
+        video.release()
+    window = get_sample_step(fps, frame_skip, sample_interval)
+
+    frames = iter_frames(video_path, frame_skip=1, callback=callback)
+    yield from select_sharpest(frames, window=window, callback=callback)
+
+
+def prepare_motion_frame(frame, width=MOTION_WIDTH):
+    """
+    Downscale frame to a small grayscale float32 image for motion estimation
+
+    Parameters:
+        frame: BGR numpy array
+        width: Width of the downscaled frame
+
+    Returns:
+        tuple: (small_frame, scale) with scale = width / original width
+    """
+    scale = min(1.0, width / frame.shape[1])
+    small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return np.float32(small), scale
+
+
+def estimate_translation(prev_small, small, window=None):
+    """
+    Estimate translation between two downscaled frames with phase correlation
+
+    Parameters:
+        prev_small: Previous frame from prepare_motion_frame
+        small: Current frame from prepare_motion_frame
+        window: Hanning window of the same size, created if None
+
+    Returns:
+        tuple: ((dx, dy), response) with the shift in downscaled pixels and
+            the phase correlation peak response (0 to 1)
+    """
+    if window is None:
+        window = cv2.createHanningWindow(small.shape[::-1], cv2.CV_32F)
+    shift, response = cv2.phaseCorrelate(prev_small, small, window)
+    return shift, response
+
+
+def select_keyframes(
+    frames, target_overlap=0.4, min_response=0.05, width=MOTION_WIDTH, callback=None
+):
+    """
+    Select frames by camera motion instead of a fixed frame interval
+
+    The translation between consecutive frames is estimated on a small
+    grayscale copy and accumulated. A frame is emitted when the overlap
+    with the last emitted frame drops to target_overlap. If a single step
+    overshoots the target (fast pan) or cannot be estimated reliably, the
+    frame before it is emitted instead, so that no gaps occur.
+
+    Parameters:
+        frames: Iterable of (frame_index, frame) tuples, usually every frame
+        target_overlap: Overlap (0 to 1) between two emitted frames
+        min_response: Minimum phase correlation response to trust a shift
+        width: Width of the frames used for motion estimation
+        callback: Callback function for progress updates
+
+    Yields:
+        tuple: (frame_index, frame)
+    """
+    window = None
+    last = None  # (frame_index, frame, small) of the previous frame
+    last_emitted_index = None
+    acc_dx, acc_dy = 0.0, 0.0
+    selected_count = 0
+
+    def overlap(dx, dy, size):
+        h, w = size
+        return max(0.0, 1 - abs(dx) / w) * max(0.0, 1 - abs(dy) / h)
+
+    for frame_index, frame in frames:
+        small, _ = prepare_motion_frame(frame, width)
+
+        if last is None:
+            window = cv2.createHanningWindow(small.shape[::-1], cv2.CV_32F)
+            last = (frame_index, frame, small)
+            last_emitted_index = frame_index
+            selected_count += 1
+            yield frame_index, frame
+            continue
+
+        (dx, dy), response = estimate_translation(last[2], small, window)
+        new_dx, new_dy = acc_dx + dx, acc_dy + dy
+        current_overlap = overlap(new_dx, new_dy, small.shape)
+
+        unreliable = response < min_response
+        if (unreliable or current_overlap < target_overlap) and (
+            last[0] != last_emitted_index
+        ):
+            # Step overshoots the target, emit the previous frame
+            selected_count += 1
+            last_emitted_index = last[0]
+            yield last[0], last[1]
+            new_dx, new_dy = dx, dy
+            current_overlap = overlap(new_dx, new_dy, small.shape)
+
+        if unreliable or current_overlap <= target_overlap:
+            selected_count += 1
+            last_emitted_index = frame_index
+            yield frame_index, frame
+            new_dx, new_dy = 0.0, 0.0
+
+        acc_dx, acc_dy = new_dx, new_dy
+        last = (frame_index, frame, small)
+
+    if last is not None and last[0] != last_emitted_index:
+        selected_count += 1
+        yield last[0], last[1]
+
+    if callback:
+        callback(f"Motion-adaptive selection kept {selected_count} frames")
+
+
+def sharpness_score(small, method="laplacian"):
+    """
+    Score the sharpness of a downscaled grayscale frame
+
+    Parameters:
+        small: Frame from prepare_motion_frame
+        method: "laplacian" (variance of the Laplacian) or "tenengrad"
+            (mean squared Sobel gradient magnitude)
+
+    Returns:
+        score: Sharpness score, higher is sharper
+    """
+    if method == "tenengrad":
+        gx = cv2.Sobel(small, cv2.CV_32F, 1, 0, ksize=3)
+        gy = cv2.Sobel(small, cv2.CV_32F, 0, 1, ksize=3)
+        return float(cv2.mean(gx * gx + gy * gy)[0])
+    _, stddev = cv2.meanStdDev(cv2.Laplacian(small, cv2.CV_32F))
+    return float(stddev[0, 0] ** 2)
+
+
+def select_sharpest(
+    frames,
+    window=5,
+    method="laplacian",
+    duplicate_threshold=2.0,
+    min_sharpness=None,
+    width=MOTION_WIDTH,
+    callback=None,
+):
+    """
+    Keep the sharpest frame of each sampling window and skip near-duplicates
 
-        count += 1
+    Parameters:
+        frames: Iterable of (frame_index, frame) tuples, usually every frame
+        window: Number of consecutive frame indices forming one window
+        method: Sharpness measure, see sharpness_score
+        duplicate_threshold: Frames whose mean absolute gray difference to
+            the last kept frame is below this value are skipped
+        min_sharpness: Frames scoring below this value are dropped, None keeps all
+        width: Width of the frames used for scoring
+        callback: Callback function for progress updates
 
-    video.release()
+    Yields:
+        tuple: (frame_index, frame)
+    """
+    window = max(1, int(window))
+    best = None  # (score, frame_index, frame, small) of the current window
+    current_window = None
+    last_small = None
+    kept_count = 0
+    dropped_count = 0
+
+    def emit(candidate):
+        nonlocal last_small, kept_count, dropped_count
+        score, _, _, small = candidate
+        if min_sharpness is not None and score < min_sharpness:
+            dropped_count += 1
+            return False
+        if last_small is not None and (
+            cv2.norm(small, last_small, cv2.NORM_L1) / small.size
+            < duplicate_threshold  # noqa: W503
+        ):
+            dropped_count += 1
+            return False
+        last_small = small
+        kept_count += 1
+        return True
+
+    for frame_index, frame in frames:
+        small, _ = prepare_motion_frame(frame, width)
+        score = sharpness_score(small, method)
+
+        frame_window = frame_index // window
+        if current_window is not None and frame_window != current_window:
+            if emit(best):
+                yield best[1], best[2]
+            best = None
+        current_window = frame_window
+
+        if best is None or score > best[0]:
+            best = (score, frame_index, frame, small)
+
+    if best is not None and emit(best):
+        yield best[1], best[2]
 
     if callback:
+        callback(
+            f"Sharpness selection kept {kept_count} frames, "
+            f"skipped {dropped_count} blurry or duplicate frames"
+        )
+
+
+def save_frames(frames, output_dir, prefix="frame", ext="jpg"):
+    """
+    Side sink writing frames to disk while passing them through
+
+    Parameters:
+        frames: Iterable of (frame_index, frame) tuples
+        output_dir: Output directory
+        prefix: File name prefix
+        ext: Image file extension
+
+    Yields:
+        tuple: (frame_index, frame), unchanged
+    """
+    create_directory(output_dir)
+
+    for frame_index, frame in frames:
+        cv2.imwrite(f"{output_dir}/{prefix}_{frame_index:04d}.{ext}", frame)
+        yield frame_index, frame
+
+
+def extract_frames(
+    video_path,
+    output_dir,
+    frame_skip=1,
+    sample_interval=None,
+    keyframe_overlap=None,
+    sharpest=False,
+    callback=None,
+):
+    """
+    Extract frames from video
+
+    Parameters:
+        video_path: Video file path
+        output_dir: Output directory
+        frame_skip: Frame interval
+        sample_interval: Time between two sampled frames in seconds,
+            overrides frame_skip if set
+        keyframe_overlap: If set, sampled frames are further selected by
+            camera motion so that consecutive frames overlap by this ratio
+        sharpest: Keep the sharpest frame of each sampling interval instead
+            of the first one and skip near-duplicate frames
+        callback: Callback function for progress updates
+
+    Returns:
+        saved_count: Number of frames saved
+    """
+    create_directory(output_dir)
+
+    frames = sample_frames(
+        video_path,
+        frame_skip=frame_skip,
+        sample_interval=sample_interval,
+        sharpest=sharpest,
+        callback=callback,
+    )
+    if keyframe_overlap:
+        frames = select_keyframes(frames, keyframe_overlap, callback=callback)
+    saved_count = sum(1 for _ in save_frames(frames, output_dir))
+
+    if callback and saved_count > 0:
         callback(f"Frame extraction complete! Extracted {saved_count} frames", 1.0)
 
     return saved_count
@@ -185,34 +637,344 @@ def get_model(model_name):
     return model, netscale, file_url, dni_weight
 
 
-def enhance_frames(input_dir, output_dir, upsampler, outscale=4, callback=None):
+def get_model_scale(model_name):
     """
-    Enhance frames
+    Get the upscale factor of a model without building it
 
     Parameters:
-        input_dir: Input directory containing original frames
-        output_dir: Output directory for enhanced frames
-        upsampler: RealESRGANer instance
+        model_name: Model name
+
+    Returns:
+        scale: Network scale
+    """
+    for model in AVAILABLE_MODELS:
+        if model["name"] == model_name:
+            return model["scale"]
+    return 4
+
+
+def get_model_path(model_name):
+    """
+    Get the path of the weight file of a model
+
+    Parameters:
+        model_name: Model name
+
+    Returns:
+        model_path: Weight file path, None for unknown models
+    """
+    if model_name not in [model["name"] for model in AVAILABLE_MODELS]:
+        return None
+    ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(ROOT_DIR, "weights", f"{model_name}.pth")
+
+
+def plan_upscale(model_name, outscale, route="auto", callback=None):
+    """
+    Plan the cheapest way to upscale frames by outscale with a model
+
+    Running a x4 network for a 2x result wastes three quarters of the
+    inference FLOPs and then spends a LANCZOS resize on throwing the extra
+    pixels away. Routes:
+        - "model": use a model of the same family trained for outscale
+          (e.g. RealESRGAN_x2plus instead of RealESRGAN_x4plus)
+        - "prescale": downscale the input so that the network scale yields
+          outscale, which cuts the FLOPs by (outscale / netscale) ** 2
+        - "resize": run the network at its own scale and resize the output
+          (previous behaviour, also used when outscale >= netscale)
+    "auto" picks "model" if the weights of the variant exist, otherwise
+    "prescale" if outscale is below the network scale, otherwise "resize".
+    "model" raises an error if there is no variant for outscale or its
+    weights are missing.
+
+    Parameters:
+        model_name: Requested model name
         outscale: Output scale factor
+        route: "auto", "model", "prescale" or "resize"
         callback: Callback function for progress updates
 
     Returns:
-        enhanced_count: Number of enhanced frames
+        plan: Dictionary with model_name, netscale and prescale (whether
+            frames are downscaled before the network)
     """
-    create_directory(output_dir)
+    netscale = get_model_scale(model_name)
+    plan = {"model_name": model_name, "netscale": netscale, "prescale": False}
+    if outscale == netscale:
+        return plan
+
+    variant = SCALE_VARIANTS.get(model_name, {}).get(outscale)
+    if variant is None and route == "model":
+        raise ValueError(f"No {outscale}x variant of {model_name} available")
+    if variant is not None and route in ("auto", "model"):
+        if os.path.exists(get_model_path(variant)):
+            plan.update(model_name=variant, netscale=outscale)
+        elif route == "model":
+            raise FileNotFoundError(
+                f"Model weight file not found {get_model_path(variant)}"
+            )
+    if plan["netscale"] != outscale and outscale < netscale:
+        plan["prescale"] = route in ("auto", "prescale")
 
-    frame_paths = sorted(glob.glob(f"{input_dir}/frame_*.jpg"))
-    total_frames = len(frame_paths)
-    enhanced_count = 0
+    if callback:
+        if plan["model_name"] != model_name:
+            callback(f"Using {plan['model_name']} for {outscale}x output")
+        elif plan["prescale"]:
+            callback(
+                f"Downscaling frames before the {netscale}x model for {outscale}x output"
+            )
+    return plan
+
+
+def prescale_frame(img, outscale, netscale):
+    """
+    Downscale a frame so that the network scale yields outscale
+
+    The downscaled size is rounded up, so the network output covers the
+    target size and only needs a crop of a few pixels instead of a resize.
+
+    Parameters:
+        img: BGR numpy array
+        outscale: Output scale factor
+        netscale: Network scale
+
+    Returns:
+        tuple: (small_img, (target_height, target_width))
+    """
+    h, w = img.shape[:2]
+    target = (int(h * outscale), int(w * outscale))
+    size = (-(-target[1] // netscale), -(-target[0] // netscale))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA), target
+
+
+def enhance_frame_stream(
+    frames,
+    upsampler,
+    outscale=4,
+    batch_size=None,
+    total=None,
+    prescale=False,
+    callback=None,
+):
+    """
+    Enhance a stream of frames with batched inference
+
+    Parameters:
+        frames: Iterable of (frame_index, frame) tuples
+        upsampler: RealESRGANer instance
+        outscale: Output scale factor
+        batch_size: Frames per forward pass. If None, enhance_batch picks it
+            from the available memory for each frame size, and frames are
+            buffered up to the batch size of the largest frame seen so far
+        total: Number of expected frames, only used for progress updates
+        prescale: Downscale frames before the network instead of resizing
+            its output, see plan_upscale
+        callback: Callback function for progress updates
+
+    Yields:
+        tuple: (frame_index, enhanced_frame)
+    """
+    batch = []
+    done = 0
+    buffer_size = batch_size
+    largest_area = 0
+
+    def flush():
+        nonlocal done
+        if prescale:
+            inputs = [prescale_frame(img, outscale, upsampler.scale) for _, img in batch]
+            results = upsampler.enhance_batch(
+                [img for img, _ in inputs], batch_size=batch_size
+            )
+            results = [
+                (output[:th, :tw], img_mode)
+                for (_, (th, tw)), (output, img_mode) in zip(inputs, results)
+            ]
+        else:
+            results = upsampler.enhance_batch(
+                [img for _, img in batch], outscale=outscale, batch_size=batch_size
+            )
+        for (frame_index, _), (output, _) in zip(batch, results):
+            done += 1
+            yield frame_index, output
+
+            # Update progress
+            if callback and (done % 5 == 0 or done == 1 or done == total):
+                if total:
+                    progress = done / total
+                    callback(
+                        f"Enhancement progress: {done}/{total} ({progress*100:.1f}%)",
+                        progress,
+                    )
+                else:
+                    callback(f"Enhancement progress: {done} frames")
+        batch.clear()
+
+    for frame_index, img in frames:
+        if batch_size is None:
+            h, w = img.shape[:2]
+            if prescale:
+                h, w = (-(-int(n * outscale) // upsampler.scale) for n in (h, w))
+            if h * w > largest_area:
+                # Frames may differ in size (regions, tiles), the largest one
+                # bounds how many frames can be processed together
+                largest_area = h * w
+                buffer_size = upsampler.get_batch_size(h, w)
+                if callback:
+                    callback(f"Enhancing frames in batches of up to {buffer_size}")
+        batch.append((frame_index, img))
+        if len(batch) >= buffer_size:
+            yield from flush()
+
+    if batch:
+        yield from flush()
+
+
+def enhance_frame_regions(
+    frames, regions, upsampler, outscale=4, prescale=False, callback=None
+):
+    """
+    Enhance only a region of each frame
+
+    The region (plus REGION_PAD pixels of context) is super-resolved, the
+    rest of the frame is only resized, so the output has the same size as
+    a fully enhanced frame.
+
+    Parameters:
+        frames: List of BGR numpy arrays
+        regions: (x, y, width, height) region of each frame
+        upsampler: RealESRGANer instance
+        outscale: Output scale factor
+        prescale: Downscale regions before the network, see plan_upscale
+        callback: Callback function for progress updates
+
+    Yields:
+        enhanced_frame: BGR numpy array upscaled by outscale
+    """
+    padded = []
+    for frame, (x, y, w, h) in zip(frames, regions):
+        height, width = frame.shape[:2]
+        x0, y0 = max(x - REGION_PAD, 0), max(y - REGION_PAD, 0)
+        x1, y1 = min(x + w + REGION_PAD, width), min(y + h + REGION_PAD, height)
+        padded.append((x0, y0, x1, y1))
+
+    crops = (
+        (idx, frame[y0:y1, x0:x1])
+        for idx, (frame, (x0, y0, x1, y1)) in enumerate(zip(frames, padded))
+    )
+    enhanced = enhance_frame_stream(
+        crops,
+        upsampler,
+        outscale=outscale,
+        total=len(frames),
+        prescale=prescale,
+        callback=callback,
+    )
+    for idx, output in enhanced:
+        frame = frames[idx]
+        x0, y0, x1, y1 = padded[idx]
+        height, width = frame.shape[:2]
+        if (x0, y0, x1, y1) == (0, 0, width, height):
+            yield output
+            continue
 
+        size = (int(width * outscale), int(height * outscale))
+        canvas = cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+        top, left = int(y0 * outscale), int(x0 * outscale)
+        output = output[: size[1] - top, : size[0] - left]
+        canvas[top : top + output.shape[0], left : left + output.shape[1]] = output
+        yield canvas
+
+
+def enhance_panorama(
+    panorama,
+    upsampler,
+    outscale=4,
+    prescale=False,
+    tile_size=PANORAMA_TILE,
+    output_path=None,
+    callback=None,
+):
+    """
+    Enhance a finished panorama tile by tile
+
+    Each output pixel is super-resolved once, instead of once for every
+    overlapping frame. Tiles (with REGION_PAD pixels of context) are
+    streamed through the model, so the memory used for inference does not
+    depend on the panorama size. With output_path the result is written to
+    a memory-mapped .npy file instead of being held in RAM.
+
+    Parameters:
+        panorama: BGR numpy array
+        upsampler: RealESRGANer instance
+        outscale: Output scale factor
+        prescale: Downscale tiles before the network, see plan_upscale
+        tile_size: Tile size in panorama pixels
+        output_path: Optional .npy file backing the enhanced panorama
+        callback: Callback function for progress updates
+
+    Returns:
+        enhanced: Enhanced panorama (numpy array or memmap)
+    """
+    height, width = panorama.shape[:2]
+    shape = (int(height * outscale), int(width * outscale), panorama.shape[2])
+    if output_path is not None:
+        output = np.lib.format.open_memmap(
+            output_path, mode="w+", dtype=panorama.dtype, shape=shape
+        )
+    else:
+        output = np.empty(shape, dtype=panorama.dtype)
+
+    tiles = [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in range(0, height, tile_size)
+        for x in range(0, width, tile_size)
+    ]
     if callback:
         callback(
-            f"Starting enhancement of {total_frames} frames, scale factor: {outscale}..."
+            f"Enhancing panorama of {width}x{height} pixels in {len(tiles)} tiles..."
         )
 
-    for idx, path in enumerate(frame_paths):
+    def padded_tiles():
+        for idx, (x0, y0, x1, y1) in enumerate(tiles):
+            px0, py0 = max(x0 - REGION_PAD, 0), max(y0 - REGION_PAD, 0)
+            px1, py1 = min(x1 + REGION_PAD, width), min(y1 + REGION_PAD, height)
+            yield idx, panorama[py0:py1, px0:px1]
+
+    enhanced = enhance_frame_stream(
+        padded_tiles(),
+        upsampler,
+        outscale=outscale,
+        total=len(tiles),
+        prescale=prescale,
+        callback=callback,
+    )
+    for idx, tile in enhanced:
+        x0, y0, x1, y1 = tiles[idx]
+        # offset of the tile in its padded crop
+        left = int((x0 - max(x0 - REGION_PAD, 0)) * outscale)
+        top = int((y0 - max(y0 - REGION_PAD, 0)) * outscale)
+        ox0, oy0 = int(x0 * outscale), int(y0 * outscale)
+        ox1, oy1 = int(x1 * outscale), int(y1 * outscale)
+        output[oy0:oy1, ox0:ox1] = tile[top : top + oy1 - oy0, left : left + ox1 - ox0]
+
+    if output_path is not None:
+        output.flush()
+    return output
+
+
+def read_frames(frame_paths, callback=None):
+    """
+    Read frames from disk
+
+    Parameters:
+        frame_paths: List of frame file paths named frame_<index>.<ext>
+        callback: Callback function for progress updates
+
+    Yields:
+        tuple: (frame_index, frame)
+    """
+    for path in frame_paths:
         frame_number = os.path.basename(path).split("_")[1].split(".")[0]
-        output_path = os.path.join(output_dir, f"enhanced_{frame_number}.png")
 
         # Read image
         img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
@@ -221,20 +983,48 @@ def enhance_frames(input_dir, output_dir, upsampler, outscale=4, callback=None):
                 callback(f"Unable to read image: {path}")
             continue
 
-        # Enhance
-        output, _ = upsampler.enhance(img, outscale=outscale)
+        yield int(frame_number), img
 
-        # Save enhanced result
-        cv2.imwrite(output_path, output)
-        enhanced_count += 1
 
-        # Update progress
-        progress = (idx + 1) / total_frames
-        if callback and ((idx + 1) % 5 == 0 or idx == 0 or idx == total_frames - 1):
-            callback(
-                f"Enhancement progress: {idx+1}/{total_frames} ({progress*100:.1f}%)",
-                progress,
-            )
+def enhance_frames(
+    input_dir, output_dir, upsampler, outscale=4, prescale=False, callback=None
+):
+    """
+    Enhance frames
+
+    Parameters:
+        input_dir: Input directory containing original frames
+        output_dir: Output directory for enhanced frames
+        upsampler: RealESRGANer instance
+        outscale: Output scale factor
+        prescale: Downscale frames before the network, see plan_upscale
+        callback: Callback function for progress updates
+
+    Returns:
+        enhanced_count: Number of enhanced frames
+    """
+    create_directory(output_dir)
+
+    frame_paths = sorted(glob.glob(f"{input_dir}/frame_*.jpg"))
+    total_frames = len(frame_paths)
+
+    if callback:
+        callback(
+            f"Starting enhancement of {total_frames} frames, scale factor: {outscale}..."
+        )
+
+    frames = read_frames(frame_paths, callback=callback)
+    enhanced = enhance_frame_stream(
+        frames,
+        upsampler,
+        outscale=outscale,
+        total=total_frames,
+        prescale=prescale,
+        callback=callback,
+    )
+    enhanced_count = sum(
+        1 for _ in save_frames(enhanced, output_dir, prefix="enhanced", ext="png")
+    )
 
     if callback:
         callback(f"Frame enhancement complete! Processed {enhanced_count} frames", 1.0)
@@ -242,12 +1032,112 @@ def enhance_frames(input_dir, output_dir, upsampler, outscale=4, callback=None):
     return enhanced_count
 
 
-def load_model(model_name, callback=None):
+def cpu_supports_bf16():
     """
-    Load super-resolution model
+    Check whether the CPU has native bfloat16 instructions (AVX512-BF16 or AMX)
+
+    Returns:
+        supported: True if bfloat16 autocast is expected to be faster than fp32
+    """
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            flags = cpuinfo.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def get_cpu_threads():
+    """
+    Get number of CPU cores available to this process
+
+    Returns:
+        threads: Number of usable cores
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def select_device(device="auto", precision="auto", num_threads=None, callback=None):
+    """
+    Select inference device and precision from the available backends
+
+    CUDA runs in fp16. Otherwise the model falls back to CPU, using bfloat16
+    autocast where the CPU supports it natively and fp32 elsewhere, with the
+    channels_last memory format and one intra-op thread per available core.
+
+    Parameters:
+        device: "auto", "cuda", "mps" or "cpu"
+        precision: "auto", "fp16", "bf16" or "fp32"
+        num_threads: Intra-op threads for CPU inference, all cores if None
+        callback: Callback function for progress updates
+
+    Returns:
+        settings: Dictionary with the keys device, gpu_id, half,
+            autocast_dtype and channels_last, see build_model
+    """
+    if device == "auto":
+        if torch.cuda.is_available():
+            device = "cuda"
+        elif getattr(torch.backends, "mps", None) and torch.backends.mps.is_available():
+            device = "mps"
+        else:
+            device = "cpu"
+
+    if precision == "auto":
+        if device == "cuda":
+            precision = "fp16"
+        elif device == "cpu" and cpu_supports_bf16():
+            precision = "bf16"
+        else:
+            precision = "fp32"
+
+    settings = {
+        "device": device,
+        "gpu_id": 0 if device == "cuda" else None,
+        "half": precision == "fp16",
+        "autocast_dtype": torch.bfloat16 if precision == "bf16" else None,
+        "channels_last": device == "cpu",
+    }
+
+    if device == "cpu":
+        torch.set_num_threads(num_threads or get_cpu_threads())
+
+    if callback:
+        callback(
+            f"Inference device: {device}, precision: {precision}, "
+            f"threads: {torch.get_num_threads()}"
+        )
+
+    return settings
+
+
+def build_model(
+    model_name,
+    device="cuda",
+    half=True,
+    gpu_id=0,
+    autocast_dtype=None,
+    channels_last=False,
+    tile=0,
+    tile_pad=10,
+    pre_pad=0,
+    callback=None,
+):
+    """
+    Build super-resolution model and load its weights from disk
 
     Parameters:
         model_name: Model name
+        device: Torch device the model runs on
+        half: Whether to use half precision
+        gpu_id: GPU index
+        autocast_dtype: dtype for torch.autocast (e.g. torch.bfloat16), None disables it
+        channels_last: Whether to use the channels_last memory format
+        tile: Tile size, 0 disables tiling
+        tile_pad: Padding of each tile
+        pre_pad: Padding of the input image
         callback: Callback function for progress updates
 
     Returns:
@@ -258,25 +1148,9 @@ def load_model(model_name, callback=None):
 
     model, netscale, _, dni_weight = get_model(model_name)
 
-    ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
-    weights_dir = os.path.join(ROOT_DIR, "weights")
-
     # Find weight file
-    model_path = None
-    if model_name == "RealESRGAN_x4plus":
-        model_path = os.path.join(weights_dir, "RealESRGAN_x4plus.pth")
-    elif model_name == "RealESRNet_x4plus":
-        model_path = os.path.join(weights_dir, "RealESRNet_x4plus.pth")
-    elif model_name == "RealESRGAN_x4plus_anime_6B":
-        model_path = os.path.join(weights_dir, "RealESRGAN_x4plus_anime_6B.pth")
-    elif model_name == "RealESRGAN_x2plus":
-        model_path = os.path.join(weights_dir, "RealESRGAN_x2plus.pth")
-    elif model_name == "realesr-animevideov3":
-        model_path = os.path.join(weights_dir, "realesr-animevideov3.pth")
-    elif model_name == "realesr-general-x4v3":
-        model_path = os.path.join(weights_dir, "realesr-general-x4v3.pth")
-
-    if not os.path.exists(model_path):
+    model_path = get_model_path(model_name)
+    if model_path is None or not os.path.exists(model_path):
         if callback:
             callback(f"Error: Model weight file not found {model_path}")
         raise FileNotFoundError(f"Model weight file not found {model_path}")
@@ -284,29 +1158,19 @@ def load_model(model_name, callback=None):
     if callback:
         callback(f"Initializing super-resolution model...")
 
-    # upsampler = RealESRGANer(
-    #     scale=netscale,
-    #     model_path=model_path,
-    #     dni_weight=dni_weight,
-    #     model=model,
-    #     tile=0,
-    #     tile_pad=10,
-    #     pre_pad=0,
-    #     half=False,
-    #     gpu_id=-1,
-    #     device="cpu",
-    # )
     upsampler = RealESRGANer(
         scale=netscale,
         model_path=model_path,
         dni_weight=dni_weight,
         model=model,
-        tile=0,
-        tile_pad=10,
-        pre_pad=0,
-        half=True,
-        gpu_id=0,
-        device="cuda",
+        tile=tile,
+        tile_pad=tile_pad,
+        pre_pad=pre_pad,
+        half=half,
+        gpu_id=gpu_id,
+        device=device,
+        autocast_dtype=autocast_dtype,
+        channels_last=channels_last,
     )
     if callback:
         callback(f"Model loading complete: {model_name}")
@@ -314,6 +1178,213 @@ def load_model(model_name, callback=None):
     return upsampler
 
 
+def get_model_memory(upsampler):
+    """
+    Get memory occupied by the weights of a loaded model
+
+    Parameters:
+        upsampler: RealESRGANer instance
+
+    Returns:
+        size: Size in bytes
+    """
+    model = upsampler.model
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def set_model_cache_budget(budget):
+    """
+    Set memory budget of the model cache and evict models exceeding it
+
+    Parameters:
+        budget: Budget in bytes
+    """
+    global MODEL_CACHE_BUDGET
+    with MODEL_CACHE_LOCK:
+        MODEL_CACHE_BUDGET = budget
+        evict_models()
+
+
+def evict_models():
+    """Evict least recently used models until the cache fits its budget (lock must be held)"""
+    while len(MODEL_CACHE) > 1 and (
+        sum(size for _, size in MODEL_CACHE.values()) > MODEL_CACHE_BUDGET
+    ):
+        MODEL_CACHE.popitem(last=False)
+
+
+def clear_model_cache():
+    """Remove all models from the cache"""
+    with MODEL_CACHE_LOCK:
+        MODEL_CACHE.clear()
+
+
+def load_model(
+    model_name,
+    callback=None,
+    device="auto",
+    precision="auto",
+    tile=0,
+    tile_pad=10,
+    pre_pad=0,
+):
+    """
+    Load super-resolution model, reusing a cached instance if available
+
+    Loaded models are kept in a process-wide LRU cache keyed by model name,
+    device, precision and tile settings. The returned instance is shared,
+    RealESRGANer.enhance is safe to call from several threads at once.
+
+    Parameters:
+        model_name: Model name
+        callback: Callback function for progress updates
+        device: "auto", "cuda", "mps" or "cpu", see select_device
+        precision: "auto", "fp16", "bf16" or "fp32", see select_device
+        tile: Tile size, 0 disables tiling
+        tile_pad: Padding of each tile
+        pre_pad: Padding of the input image
+
+    Returns:
+        upsampler: RealESRGANer instance
+    """
+    device_settings = select_device(device, precision, callback=callback)
+    key = (
+        model_name,
+        device_settings["device"],
+        device_settings["half"],
+        device_settings["autocast_dtype"],
+        tile,
+        tile_pad,
+        pre_pad,
+    )
+
+    with MODEL_CACHE_LOCK:
+        if key in MODEL_CACHE:
+            MODEL_CACHE.move_to_end(key)
+            if callback:
+                callback(f"Using cached model: {model_name}")
+            return MODEL_CACHE[key][0]
+
+        upsampler = build_model(
+            model_name,
+            tile=tile,
+            tile_pad=tile_pad,
+            pre_pad=pre_pad,
+            callback=callback,
+            **device_settings,
+        )
+        MODEL_CACHE[key] = (upsampler, get_model_memory(upsampler))
+        evict_models()
+
+    return upsampler
+
+
+def warm_up_models(model_names, callback=None):
+    """
+    Load models into the cache ahead of the first request
+
+    Parameters:
+        model_names: List of model names
+        callback: Callback function for progress updates
+
+    Returns:
+        loaded: List of model names that could be loaded
+    """
+    loaded = []
+    for model_name in model_names:
+        try:
+            load_model(model_name, callback=callback)
+        except FileNotFoundError:
+            continue
+        loaded.append(model_name)
+    return loaded
+
+
+def load_enhancer(params=None, callback=None):
+    """
+    Plan the upscale route and load the model for processing parameters
+
+    Parameters:
+        params: Processing parameter dictionary, see process_video
+        callback: Callback function for progress updates
+
+    Returns:
+        tuple: (upsampler, plan) with plan as returned by plan_upscale
+    """
+    if params is None:
+        params = {}
+
+    plan = plan_upscale(
+        params.get("model_name", "RealESRGAN_x4plus"),
+        params.get("outscale", 2),
+        route=params.get("scale_route", "auto"),
+        callback=callback,
+    )
+    upsampler = load_model(
+        plan["model_name"],
+        callback=callback,
+        device=params.get("device", "auto"),
+        precision=params.get("precision", "auto"),
+    )
+    return upsampler, plan
+
+
+def stream_video(video_path, params=None, save_dir=None, callback=None):
+    """
+    Stream video frames through extraction and optional enhancement in memory
+
+    Parameters:
+        video_path: Video file path
+        params: Processing parameter dictionary, see process_video
+        save_dir: If set, frames (and enhanced frames) are additionally
+            written below this directory as a side effect
+        callback: Callback function for progress updates
+
+    Yields:
+        tuple: (frame_index, frame) with frame as BGR numpy array
+    """
+    if params is None:
+        params = {}
+
+    frame_skip = params.get("frame_skip", 5)
+    enhance = params.get("enhance", True)
+    outscale = params.get("outscale", 2)
+    sample_interval = params.get("sample_interval")
+    seek_threshold = params.get("seek_threshold", SEEK_THRESHOLD)
+    keyframe_overlap = params.get("keyframe_overlap")
+    sharpest = params.get("sharpest", False)
+
+    frames = sample_frames(
+        video_path,
+        frame_skip=frame_skip,
+        sample_interval=sample_interval,
+        seek_threshold=seek_threshold,
+        sharpest=sharpest,
+        callback=callback,
+    )
+    if keyframe_overlap:
+        frames = select_keyframes(frames, keyframe_overlap, callback=callback)
+    if save_dir is not None:
+        frames = save_frames(frames, os.path.join(save_dir, "frames"))
+
+    if enhance:
+        upsampler, plan = load_enhancer(params, callback=callback)
+        frames = enhance_frame_stream(
+            frames,
+            upsampler,
+            outscale=outscale,
+            prescale=plan["prescale"],
+            callback=callback,
+        )
+        if save_dir is not None:
+            frames = save_frames(
+                frames, os.path.join(save_dir, "enhanced"), prefix="enhanced", ext="png"
+            )
+
+    yield from frames
+
+
 def process_video(video_path, output_dir=None, params=None, callback=None):
     """
     Process video: Extract frames and optionally enhance
@@ -323,9 +1394,24 @@ def process_video(video_path, output_dir=None, params=None, callback=None):
         output_dir: Output directory, creates random directory if None
         params: Processing parameter dictionary, containing:
             - frame_skip: Frame interval
+            - sample_interval: Time between two sampled frames in seconds,
+              overrides frame_skip if set
+            - seek_threshold: Minimum frame gap for seeking instead of grabbing
+            - keyframe_overlap: If set, frames are selected by camera motion
+              so that consecutive frames overlap by this ratio (e.g. 0.4)
+            - sharpest: Keep the sharpest frame of each sampling interval
+              instead of the first one and skip near-duplicate frames
             - enhance: Whether to perform super-resolution
             - model_name: Super-resolution model name
             - outscale: Output scale factor
+            - scale_route: How outscale is reached if it differs from the
+              model scale ("auto", "model", "prescale" or "resize"), see
+              plan_upscale
+            - device: Inference device ("auto", "cuda", "mps" or "cpu")
+            - precision: Inference precision ("auto", "fp16", "bf16" or "fp32")
+            - in_memory: Keep frames as numpy arrays instead of writing
+              them to disk, returned as result["frames"]
+            - save_frames: Additionally write frames to disk in in_memory mode
         callback: Callback function for progress updates
 
     Returns:
@@ -339,6 +1425,15 @@ def process_video(video_path, output_dir=None, params=None, callback=None):
     enhance = params.get("enhance", True)
     model_name = params.get("model_name", "RealESRGAN_x4plus")
     outscale = params.get("outscale", 2)
+    sample_interval = params.get("sample_interval")
+    keyframe_overlap = params.get("keyframe_overlap")
+    sharpest = params.get("sharpest", False)
+    in_memory = params.get("in_memory", False)
+
+    if in_memory:
+        return process_video_in_memory(
+            video_path, output_dir=output_dir, params=params, callback=callback
+        )
 
     # Create unique working directory
     if output_dir is None:
@@ -362,6 +1457,9 @@ def process_video(video_path, output_dir=None, params=None, callback=None):
         video_path=video_path,
         output_dir=frames_dir,
         frame_skip=frame_skip,
+        sample_interval=sample_interval,
+        keyframe_overlap=keyframe_overlap,
+        sharpest=sharpest,
         callback=callback,
     )
 
@@ -376,7 +1474,7 @@ def process_video(video_path, output_dir=None, params=None, callback=None):
     # Step 2: If enhancement enabled, perform super-resolution processing
     if enhance:
         # Load model
-        upsampler = load_model(model_name, callback=callback)
+        upsampler, plan = load_enhancer(params, callback=callback)
 
         # Enhance frames
         enhanced_count = enhance_frames(
@@ -384,6 +1482,7 @@ def process_video(video_path, output_dir=None, params=None, callback=None):
             output_dir=enhanced_dir,
             upsampler=upsampler,
             outscale=outscale,
+            prescale=plan["prescale"],
             callback=callback,
         )
 
@@ -403,6 +1502,57 @@ def process_video(video_path, output_dir=None, params=None, callback=None):
     return result
 
 
+def process_video_in_memory(video_path, output_dir=None, params=None, callback=None):
+    """
+    Process video without the JPEG round-trip between extraction and enhancement
+
+    Parameters:
+        video_path: Video file path
+        output_dir: Output directory, only used if params["save_frames"] is set
+        params: Processing parameter dictionary, see process_video
+        callback: Callback function for progress updates
+
+    Returns:
+        result: Dictionary containing processing results, the processed
+            frames are stored under result["frames"]
+    """
+    if params is None:
+        params = {}
+
+    enhance = params.get("enhance", True)
+    save_dir = None
+    if params.get("save_frames", False):
+        save_dir = output_dir or f"process_{uuid.uuid4().hex[:8]}"
+        create_directory(save_dir)
+
+    frames = [
+        frame
+        for _, frame in stream_video(
+            video_path, params=params, save_dir=save_dir, callback=callback
+        )
+    ]
+
+    result = {"frames": frames, "frames_count": len(frames), "enhanced": False}
+    if save_dir is not None:
+        result["frames_dir"] = os.path.join(save_dir, "frames")
+
+    if len(frames) == 0:
+        if callback:
+            callback("Error: Failed to extract any frames")
+        return result
+
+    if enhance:
+        result["enhanced"] = True
+        result["enhanced_count"] = len(frames)
+        if save_dir is not None:
+            result["enhanced_dir"] = os.path.join(save_dir, "enhanced")
+
+    if callback:
+        callback(f"Processing complete! {len(frames)} frames kept in memory", 1.0)
+
+    return result
+
+
 def main():
     video_path = "8290394d23cb3589e70f6060b13c2592.mp4"
     output_dir = f"process_{uuid.uuid4().hex[:8]}"
@@ -1,4 +1,5 @@
 from stitching import Stitcher, AffineStitcher
+from stitching.images import Images
 import cv2
 import glob
 import os
@@ -6,27 +7,55 @@ import uuid
 import tempfile
 import numpy as np
 import math
-
-def create_panorama(
-    input_dir, output_file, settings=None, callback=None, interim_callback=None
-):
+import time
+
+# Video frames only overlap their temporal neighbours, so longer sequences
+# are matched within a sliding window plus a few long-range candidates
+VIDEO_MATCHING_MIN_FRAMES = 10
+VIDEO_MATCHING_RANGE_WIDTH = 3
+VIDEO_MATCHING_LOOP_CLOSURES = 3
+
+# Live panorama: frames are tracked at track_width, blended at canvas_scale
+# and previews are emitted at most every preview_interval seconds
+LIVE_DEFAULT_SETTINGS = {
+    "transform": "affine",
+    "track_width": 480,
+    "track_features": 500,
+    "min_inliers": 15,
+    "keyframe_shift": 0.15,
+    "canvas_scale": 0.5,
+    "frame_skip": 1,
+    "preview_interval": 0.5,
+    "preview_width": 1280,
+    "latency_target": 0.05,
+    "max_lost_frames": 10,
+    "max_canvas_size": 20000,
+}
+# Frame rate assumed for live devices which do not report it
+LIVE_FALLBACK_FPS = 30
+
+
+def apply_default_settings(settings):
     """
-    Create panorama image from images in specified directory
+    Fill in default stitcher settings
 
     Parameters:
-        input_dir: Directory containing input images
-        output_file: Output panorama image file path
-        settings: Dictionary of stitcher settings
-        callback: Callback function for logging process and updating progress
-        interim_callback: Interim result callback for returning real-time results during stitching
+        settings: Dictionary of stitcher settings or None
 
     Returns:
-        panorama: Stitched panorama image
+        settings: Settings dictionary with defaults for missing keys
     """
     # Default settings
     default_settings = {
         "crop": True,
         "confidence_threshold": 0.05,
+        # detect and match features on all CPUs
+        "detection_workers": 0,
+        "matching_workers": 0,
+        # reuse features across runs with different stitching settings
+        "feature_cache_dir": os.path.join(
+            tempfile.gettempdir(), "panorama_feature_cache"
+        ),
     }
 
     # Use provided settings or default settings
@@ -36,6 +65,56 @@ def create_panorama(
         for key, value in default_settings.items():
             if key not in settings:
                 settings[key] = value
+    return settings
+
+
+def apply_video_matching(settings, num_frames, callback=None):
+    """
+    Restrict feature matching to temporal neighbours for longer sequences
+
+    Matching all pairs is quadratic in the number of frames. If no range_width
+    is configured, each frame is matched with its VIDEO_MATCHING_RANGE_WIDTH
+    successors and VIDEO_MATCHING_LOOP_CLOSURES sparse long-range candidates.
+
+    Parameters:
+        settings: Dictionary of stitcher settings
+        num_frames: Number of frames to stitch
+        callback: Callback function for logging process
+
+    Returns:
+        settings: Copy of the settings with the matching strategy applied
+    """
+    settings = dict(settings)
+    if "range_width" in settings or num_frames < VIDEO_MATCHING_MIN_FRAMES:
+        return settings
+
+    settings["range_width"] = VIDEO_MATCHING_RANGE_WIDTH
+    settings.setdefault("loop_closures", VIDEO_MATCHING_LOOP_CLOSURES)
+    if callback:
+        callback(
+            f"Sequential matching: {settings['range_width']} neighbours and "
+            f"{settings['loop_closures']} loop closure candidates per frame"
+        )
+    return settings
+
+
+def create_panorama(
+    input_dir, output_file, settings=None, callback=None, interim_callback=None
+):
+    """
+    Create panorama image from images in specified directory
+
+    Parameters:
+        input_dir: Directory containing input images
+        output_file: Output panorama image file path
+        settings: Dictionary of stitcher settings
+        callback: Callback function for logging process and updating progress
+        interim_callback: Interim result callback for returning real-time results during stitching
+
+    Returns:
+        panorama: Stitched panorama image
+    """
+    settings = apply_default_settings(settings)
 
     if callback:
         callback(f"Starting panorama creation, input directory: {input_dir}")
@@ -54,16 +133,6 @@ def create_panorama(
     if callback:
         callback(f"Found {len(frames_paths)} image files for stitching")
 
-    # If only one image, return it directly
-    if len(frames_paths) == 1:
-        if callback:
-            callback("Only one image, no stitching needed")
-        image = cv2.imread(frames_paths[0])
-        cv2.imwrite(output_file, image)
-        if interim_callback:
-            interim_callback(image, 1, 1)
-        return image
-
     # Read all images
     images = []
     for path in frames_paths:
@@ -76,19 +145,76 @@ def create_panorama(
             callback("Error: Unable to read any images")
         return None
 
-    # Create stitcher object
+    return create_panorama_from_frames(
+        images,
+        output_file,
+        settings=settings,
+        callback=callback,
+        interim_callback=interim_callback,
+    )
+
+
+def create_stitcher(settings, callback=None):
+    """
+    Create stitcher object for the given settings
+
+    Parameters:
+        settings: Dictionary of stitcher settings
+        callback: Callback function for logging process
+
+    Returns:
+        stitcher: Stitcher or AffineStitcher instance
+    """
     if settings.get("estimator") == "affine":
         if callback:
             callback("Using affine transform stitcher")
-        stitcher = AffineStitcher(**settings)
-    else:
+        return AffineStitcher(**settings)
+    if callback:
+        callback("Using standard stitcher")
+    return Stitcher(**settings)
+
+
+def create_panorama_from_frames(
+    frames, output_file, settings=None, callback=None, interim_callback=None
+):
+    """
+    Create panorama image from frames already held in memory
+
+    Parameters:
+        frames: Iterable of BGR numpy arrays (in order)
+        output_file: Output panorama image file path
+        settings: Dictionary of stitcher settings
+        callback: Callback function for logging process and updating progress
+        interim_callback: Interim result callback for returning real-time results during stitching
+
+    Returns:
+        panorama: Stitched panorama image
+    """
+    settings = apply_default_settings(settings)
+
+    images = [frame for frame in frames if frame is not None]
+
+    if len(images) == 0:
+        if callback:
+            callback("Error: No frames available for stitching")
+        return None
+
+    # If only one image, return it directly
+    if len(images) == 1:
         if callback:
-            callback("Using standard stitcher")
-        stitcher = Stitcher(**settings)
+            callback("Only one image, no stitching needed")
+        image = images[0]
+        cv2.imwrite(output_file, image)
+        if interim_callback:
+            interim_callback(image, 1, 1)
+        return image
+
+    settings = apply_video_matching(settings, len(images), callback)
+    stitcher = create_stitcher(settings, callback)
 
     # Stitch all images at once
     if callback:
-        callback("Stitching all images...")
+        callback(f"Stitching all {len(images)} images...")
 
     panorama = stitcher.stitch(images)
 
@@ -106,6 +232,577 @@ def create_panorama(
     return panorama
 
 
+def create_enhanced_panorama(
+    frames,
+    output_file,
+    enhance,
+    outscale,
+    settings=None,
+    callback=None,
+    interim_callback=None,
+):
+    """
+    Create panorama from raw frames, super-resolving only what ends up in it
+
+    The stitcher only uses the medium (0.6 MP) and low (0.1 MP) resolution
+    for registration and seam finding, so these steps run on the raw frames.
+    Afterwards only frames that survive the subsetting are enhanced, and
+    with cropping enabled only the region of each frame that is mapped into
+    the cropped panorama.
+
+    Parameters:
+        frames: Iterable of raw BGR numpy arrays (in order)
+        output_file: Output panorama image file path
+        enhance: Function (frames, regions) -> iterable of frames upscaled
+            by outscale, where regions are (x, y, width, height) rectangles
+            of the frames that need super-resolution
+        outscale: Scale factor of the enhanced frames
+        settings: Dictionary of stitcher settings
+        callback: Callback function for logging process and updating progress
+        interim_callback: Interim result callback for returning real-time results during stitching
+
+    Returns:
+        panorama: Stitched panorama image
+    """
+    settings = apply_default_settings(settings)
+
+    images = [frame for frame in frames if frame is not None]
+
+    if len(images) == 0:
+        if callback:
+            callback("Error: No frames available for stitching")
+        return None
+
+    # If only one image, enhance it completely
+    if len(images) == 1:
+        if callback:
+            callback("Only one image, no stitching needed")
+        h, w = images[0].shape[:2]
+        image = next(iter(enhance(images, [(0, 0, w, h)])))
+        cv2.imwrite(output_file, image)
+        if interim_callback:
+            interim_callback(image, 1, 1)
+        return image
+
+    settings = apply_video_matching(settings, len(images), callback)
+    stitcher = create_stitcher(settings, callback)
+
+    if callback:
+        callback(f"Registering all {len(images)} raw images...")
+
+    cameras, seam_masks = stitcher.estimate_panorama(images)
+
+    # Frames that survived the subsetting and their regions in the panorama
+    kept = list(stitcher.images)
+    regions = stitcher.get_source_regions(cameras)
+    if callback:
+        used = sum(r.area for r in regions)
+        total = sum(img.shape[0] * img.shape[1] for img in images)
+        callback(
+            f"Enhancing {len(kept)}/{len(images)} images, "
+            f"{used / total * 100:.1f}% of the input pixels"
+        )
+
+    enhanced = enhance(kept, [tuple(region) for region in regions])
+    stitcher.images.scale_resolution(Images.Resolution.FINAL, outscale)
+    panorama = stitcher.compose_panorama(cameras, seam_masks, enhanced)
+
+    if panorama is None or panorama.size == 0:
+        if callback:
+            callback("Stitching failed: Unable to create panorama")
+        return None
+
+    # Save result
+    cv2.imwrite(output_file, panorama)
+    if callback:
+        callback(f"Panorama successfully created: {output_file}")
+    if interim_callback:
+        interim_callback(panorama, len(images), len(images))
+    return panorama
+
+
+def apply_live_settings(settings):
+    """
+    Fill in default settings of the live panorama
+
+    Parameters:
+        settings: Dictionary of live panorama settings or None
+
+    Returns:
+        settings: Settings dictionary with defaults for missing keys
+    """
+    live_settings = dict(LIVE_DEFAULT_SETTINGS)
+    if settings:
+        live_settings.update(settings)
+    return live_settings
+
+
+def track_features(frame, detector, track_width):
+    """
+    Detect features on a downscaled grayscale version of the frame
+
+    Parameters:
+        frame: BGR numpy array
+        detector: cv2.Feature2D instance
+        track_width: Width of the downscaled frame
+
+    Returns:
+        tuple: (points, descriptors, scale) with the keypoint coordinates in
+            the downscaled frame and scale = track_width / frame width
+    """
+    scale = min(1.0, track_width / frame.shape[1])
+    small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    keypoints, descriptors = detector.detectAndCompute(gray, None)
+    points = cv2.KeyPoint_convert(keypoints).reshape(-1, 2)
+    return points, descriptors, scale
+
+
+def register_frame(features, reference, matcher, transform="affine", min_inliers=15):
+    """
+    Estimate the transformation from a frame to a reference frame
+
+    Parameters:
+        features: (points, descriptors, scale) of the frame from track_features
+        reference: (points, descriptors, scale) of the reference frame
+        matcher: cv2.DescriptorMatcher instance
+        transform: "affine" (rotation, uniform scale and translation) or "homography"
+        min_inliers: Minimum number of RANSAC inliers for a valid registration
+
+    Returns:
+        tuple: (matrix, inliers), matrix is a 3x3 transformation in full
+            resolution frame coordinates or None if the registration failed
+    """
+    points, descriptors, scale = features
+    ref_points, ref_descriptors, _ = reference
+    if descriptors is None or ref_descriptors is None or len(ref_descriptors) < 2:
+        return None, 0
+
+    pairs = matcher.knnMatch(descriptors, ref_descriptors, k=2)
+    good = [
+        pair[0]
+        for pair in pairs
+        if len(pair) == 2 and pair[0].distance < 0.75 * pair[1].distance
+    ]
+    if len(good) < min_inliers:
+        return None, len(good)
+
+    src = points[[match.queryIdx for match in good]]
+    dst = ref_points[[match.trainIdx for match in good]]
+    if transform == "homography":
+        matrix, inliers = cv2.findHomography(src, dst, cv2.RANSAC, 3.0)
+    else:
+        matrix, inliers = cv2.estimateAffinePartial2D(
+            src, dst, method=cv2.RANSAC, ransacReprojThreshold=3.0
+        )
+        if matrix is not None:
+            matrix = np.vstack([matrix, [0, 0, 1]])
+    num_inliers = int(inliers.sum()) if inliers is not None else 0
+    if matrix is None or num_inliers < min_inliers:
+        return None, num_inliers
+
+    # From downscaled to full resolution frame coordinates
+    to_small = np.diag([scale, scale, 1.0])
+    return np.linalg.inv(to_small) @ matrix @ to_small, num_inliers
+
+
+def is_valid_transform(matrix, width, height, max_scale_change=2.0):
+    """
+    Check that a frame to frame transformation is plausible for a moving camera
+
+    Parameters:
+        matrix: 3x3 transformation in full resolution frame coordinates
+        width: Frame width
+        height: Frame height
+        max_scale_change: Maximum change of the frame area (and its inverse)
+
+    Returns:
+        bool: False for degenerate transformations (flips, collapsing or
+            exploding scale, strong perspective distortion)
+    """
+    matrix = matrix / matrix[2, 2]
+    area_scale = np.linalg.det(matrix[:2, :2])
+    if not 1 / max_scale_change <= area_scale <= max_scale_change:
+        return False
+    # Change of the projective divisor across the frame
+    perspective = abs(matrix[2, 0]) * width + abs(matrix[2, 1]) * height
+    return perspective < 0.5
+
+
+def get_feather_weights(height, width):
+    """
+    Blending weights of a frame, falling off linearly towards its borders
+
+    Parameters:
+        height: Frame height
+        width: Frame width
+
+    Returns:
+        weights: float32 array of shape (height, width) in (0, 1]
+    """
+    wy = np.minimum(np.arange(1, height + 1), np.arange(height, 0, -1)) / (height / 2)
+    wx = np.minimum(np.arange(1, width + 1), np.arange(width, 0, -1)) / (width / 2)
+    return np.float32(np.outer(np.minimum(wy, 1), np.minimum(wx, 1)))
+
+
+def blend_into_canvas(mosaic, frame, matrix, max_canvas_size):
+    """
+    Warp frame into the growing canvas and blend it with the content
+
+    The canvas grows by at least half of its size when a frame exceeds it,
+    so it is only reallocated a few times. Pixels are blended by the
+    accumulated feather weights of the frames covering them.
+
+    Parameters:
+        mosaic: Dictionary with canvas, weights, origin and bounds (updated)
+        frame: BGR numpy array at canvas scale
+        matrix: 3x3 transformation from frame to canvas coordinates
+        max_canvas_size: Maximum width and height of the panorama
+
+    Returns:
+        bool: False if the frame was rejected, because its warped bounding
+            box is more than 3 times its size or exceeds max_canvas_size
+    """
+    h, w = frame.shape[:2]
+    corners = np.float32([[0, 0], [w, 0], [w, h], [0, h]]).reshape(-1, 1, 2)
+    corners = cv2.perspectiveTransform(corners, matrix).reshape(-1, 2)
+    if not np.isfinite(corners).all():
+        return False
+    x1, y1 = np.floor(corners.min(axis=0)).astype(int)
+    x2, y2 = np.ceil(corners.max(axis=0)).astype(int)
+    if x2 - x1 > 3 * w or y2 - y1 > 3 * h:
+        return False
+    if mosaic["bounds"] is not None:
+        bx1, by1, bx2, by2 = mosaic["bounds"]
+        if (
+            max(bx2, x2) - min(bx1, x1) > max_canvas_size
+            or max(by2, y2) - min(by1, y1) > max_canvas_size
+        ):
+            return False
+
+    if mosaic["canvas"] is None:
+        mosaic["canvas"] = np.zeros((y2 - y1, x2 - x1, 3), np.uint8)
+        mosaic["weights"] = np.zeros((y2 - y1, x2 - x1), np.float32)
+        mosaic["origin"] = (x1, y1)
+        mosaic["bounds"] = (x1, y1, x2, y2)
+
+    # Grow the canvas if the frame exceeds it
+    ox, oy = mosaic["origin"]
+    ch, cw = mosaic["weights"].shape
+    if x1 < ox or y1 < oy or x2 > ox + cw or y2 > oy + ch:
+        nx1 = min(x1, ox - cw // 2) if x1 < ox else ox
+        ny1 = min(y1, oy - ch // 2) if y1 < oy else oy
+        nx2 = max(x2, ox + cw + cw // 2) if x2 > ox + cw else ox + cw
+        ny2 = max(y2, oy + ch + ch // 2) if y2 > oy + ch else oy + ch
+        # Only grow as far as needed close to the maximum size
+        if nx2 - nx1 > max_canvas_size:
+            nx1, nx2 = min(x1, ox), max(x2, ox + cw)
+        if ny2 - ny1 > max_canvas_size:
+            ny1, ny2 = min(y1, oy), max(y2, oy + ch)
+        canvas = np.zeros((ny2 - ny1, nx2 - nx1, 3), np.uint8)
+        weights = np.zeros((ny2 - ny1, nx2 - nx1), np.float32)
+        canvas[oy - ny1 : oy - ny1 + ch, ox - nx1 : ox - nx1 + cw] = mosaic["canvas"]
+        weights[oy - ny1 : oy - ny1 + ch, ox - nx1 : ox - nx1 + cw] = mosaic["weights"]
+        mosaic["canvas"], mosaic["weights"] = canvas, weights
+        mosaic["origin"] = ox, oy = nx1, ny1
+
+    # Warp only into the bounding box of the frame
+    to_roi = np.array([[1, 0, -x1], [0, 1, -y1], [0, 0, 1]], np.float64) @ matrix
+    size = (x2 - x1, y2 - y1)
+    patch = cv2.warpPerspective(frame, to_roi, size, flags=cv2.INTER_LINEAR)
+    patch_weights = cv2.warpPerspective(
+        get_feather_weights(h, w), to_roi, size, flags=cv2.INTER_LINEAR
+    )
+
+    roi = np.s_[y1 - oy : y2 - oy, x1 - ox : x2 - ox]
+    weights = mosaic["weights"][roi]
+    total = weights + patch_weights
+    covered = total > 0
+    blended = (
+        mosaic["canvas"][roi] * weights[..., None] + patch * patch_weights[..., None]
+    )[covered] / total[covered][:, None]
+    mosaic["canvas"][roi][covered] = np.clip(blended + 0.5, 0, 255).astype(np.uint8)
+    mosaic["weights"][roi] = total
+
+    bx1, by1, bx2, by2 = mosaic["bounds"]
+    mosaic["bounds"] = (min(bx1, x1), min(by1, y1), max(bx2, x2), max(by2, y2))
+    return True
+
+
+def get_mosaic_image(mosaic):
+    """
+    Get the covered part of the canvas
+
+    Parameters:
+        mosaic: Dictionary with canvas, weights, origin and bounds
+
+    Returns:
+        image: BGR numpy array (view of the canvas) or None if empty
+    """
+    if mosaic["canvas"] is None:
+        return None
+    ox, oy = mosaic["origin"]
+    x1, y1, x2, y2 = mosaic["bounds"]
+    return mosaic["canvas"][y1 - oy : y2 - oy, x1 - ox : x2 - ox]
+
+
+def stream_panorama(source, settings=None, callback=None, interim_callback=None):
+    """
+    Build a panorama while reading frames from a video file or live device
+
+    Every frame is registered against the last keyframe with a lightweight
+    ORB tracker (on a downscaled grayscale copy), or against the last
+    registered frame if that fails. Implausible transformations are rejected.
+    After max_lost_frames frames in a row could not be registered, tracking
+    starts over from the current frame at the last known position. Frames
+    that moved at least keyframe_shift (fraction of the frame width) away
+    from the last keyframe become keyframes and are blended into a growing
+    canvas. Previews are emitted through interim_callback at most every
+    preview_interval seconds.
+
+    For live devices, frames that arrive while a slow frame (exceeding
+    latency_target) is processed are dropped, so the panorama keeps up with
+    the camera. Their number follows from the frame rate of the device.
+
+    Parameters:
+        source: Video file path or device index for cv2.VideoCapture
+        settings: Dictionary of live panorama settings, see LIVE_DEFAULT_SETTINGS
+        callback: Callback function for logging process and updating progress
+        interim_callback: Preview callback (image, processed_frames, total_frames)
+
+    Returns:
+        tuple: (panorama, stats), panorama is None if no frame was read and
+            stats holds the frame counts and the per-frame latencies in seconds
+    """
+    settings = apply_live_settings(settings)
+    video = cv2.VideoCapture(source)
+    if not video.isOpened():
+        if callback:
+            callback(f"Error: Unable to open video source {source}")
+        return None, None
+    total_frames = max(int(video.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
+    live = isinstance(source, int)
+    fps = video.get(cv2.CAP_PROP_FPS)
+    if not fps or fps <= 0:
+        fps = LIVE_FALLBACK_FPS
+
+    detector = cv2.ORB_create(nfeatures=settings["track_features"])
+    matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+    canvas_scale = settings["canvas_scale"]
+    to_canvas = np.diag([canvas_scale, canvas_scale, 1.0])
+    mosaic = {"canvas": None, "weights": None, "origin": None, "bounds": None}
+
+    reference = None
+    reference_transform = None
+    previous = None
+    previous_transform = None
+    lost_in_row = 0
+    latencies = []
+    stats = {
+        "frames": 0,
+        "registered": 0,
+        "keyframes": 0,
+        "lost": 0,
+        "reacquired": 0,
+        "rejected": 0,
+        "dropped": 0,
+    }
+    last_preview = 0
+    frame_index = -1
+
+    try:
+        while True:
+            success, frame = video.read()
+            if not success:
+                break
+            frame_index += 1
+            if frame_index % settings["frame_skip"]:
+                continue
+
+            start = time.perf_counter()
+            stats["frames"] += 1
+            features = track_features(frame, detector, settings["track_width"])
+
+            h, w = frame.shape[:2]
+            keyframe = False
+            if reference is None:
+                transform = np.eye(3)
+                keyframe = True
+            else:
+                transform = None
+                candidates = [(reference, reference_transform)]
+                if previous is not None and previous is not reference:
+                    candidates.append((previous, previous_transform))
+                for candidate, candidate_transform in candidates:
+                    matrix, _ = register_frame(
+                        features,
+                        candidate,
+                        matcher,
+                        transform=settings["transform"],
+                        min_inliers=settings["min_inliers"],
+                    )
+                    if matrix is not None and is_valid_transform(matrix, w, h):
+                        transform = candidate_transform @ matrix
+                        break
+
+                if transform is None:
+                    stats["lost"] += 1
+                    lost_in_row += 1
+                    if lost_in_row >= settings["max_lost_frames"]:
+                        # Start over from this frame at the last known position
+                        reference, reference_transform = features, previous_transform
+                        previous = None
+                        lost_in_row = 0
+                        stats["reacquired"] += 1
+                else:
+                    stats["registered"] += 1
+                    lost_in_row = 0
+                    previous, previous_transform = features, transform
+                    to_reference = np.linalg.inv(reference_transform) @ transform
+                    center = to_reference @ np.array([w / 2, h / 2, 1.0])
+                    shift = np.hypot(*(center[:2] / center[2] - (w / 2, h / 2)))
+                    keyframe = shift >= settings["keyframe_shift"] * w
+
+            if keyframe:
+                small = cv2.resize(
+                    frame,
+                    None,
+                    fx=canvas_scale,
+                    fy=canvas_scale,
+                    interpolation=cv2.INTER_AREA,
+                )
+                keyframe = blend_into_canvas(
+                    mosaic,
+                    small,
+                    to_canvas @ transform @ np.linalg.inv(to_canvas),
+                    settings["max_canvas_size"],
+                )
+                if keyframe:
+                    reference, reference_transform = features, transform
+                    previous, previous_transform = features, transform
+                    stats["keyframes"] += 1
+                else:
+                    stats["rejected"] += 1
+
+            latency = time.perf_counter() - start
+            latencies.append(latency)
+
+            now = time.perf_counter()
+            if (
+                interim_callback
+                and keyframe
+                and (now - last_preview >= settings["preview_interval"])
+            ):
+                interim_callback(
+                    get_preview(mosaic, settings["preview_width"]),
+                    frame_index + 1,
+                    total_frames,
+                )
+                last_preview = time.perf_counter()
+
+            if live and latency > settings["latency_target"]:
+                # Drop the frames the camera delivered in the meantime
+                for _ in range(int(latency * fps)):
+                    if video.grab():
+                        stats["dropped"] += 1
+
+            if callback and stats["frames"] % 50 == 0:
+                callback(
+                    f"Live panorama: {stats['frames']} frames, "
+                    f"{stats['keyframes']} keyframes, "
+                    f"last latency {latency * 1000:.1f} ms"
+                )
+    finally:
+        video.release()
+
+    stats.update(get_latency_stats(latencies, settings["latency_target"]))
+    panorama = get_mosaic_image(mosaic)
+    if panorama is not None:
+        panorama = panorama.copy()
+    return panorama, stats
+
+
+def get_preview(mosaic, width):
+    """
+    Downscaled copy of the current panorama for previews
+
+    Parameters:
+        mosaic: Dictionary with canvas, weights, origin and bounds
+        width: Maximum preview width
+
+    Returns:
+        preview: BGR numpy array
+    """
+    image = get_mosaic_image(mosaic)
+    scale = min(1.0, width / image.shape[1])
+    return cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def get_latency_stats(latencies, latency_target):
+    """
+    Summarize per-frame latencies
+
+    Parameters:
+        latencies: Processing times of the frames in seconds
+        latency_target: Latency target in seconds
+
+    Returns:
+        stats: Dictionary with mean, p95 and max latency in seconds and
+            the fraction of frames within the target
+    """
+    if not latencies:
+        return {"mean_latency": 0, "p95_latency": 0, "max_latency": 0, "on_target": 0}
+    latencies = np.array(latencies)
+    return {
+        "mean_latency": float(latencies.mean()),
+        "p95_latency": float(np.percentile(latencies, 95)),
+        "max_latency": float(latencies.max()),
+        "on_target": float((latencies <= latency_target).mean()),
+    }
+
+
+def create_live_panorama(
+    source, output_file, settings=None, callback=None, interim_callback=None
+):
+    """
+    Create panorama from a video file or live device with real-time previews
+
+    Parameters:
+        source: Video file path or device index for cv2.VideoCapture
+        output_file: Output panorama image file path
+        settings: Dictionary of live panorama settings, see LIVE_DEFAULT_SETTINGS
+        callback: Callback function for logging process and updating progress
+        interim_callback: Preview callback (image, processed_frames, total_frames)
+
+    Returns:
+        panorama: Stitched panorama image
+    """
+    settings = apply_live_settings(settings)
+    if callback:
+        callback(f"Starting live panorama from {source}, settings: {settings}")
+
+    panorama, stats = stream_panorama(source, settings, callback, interim_callback)
+    if panorama is None:
+        if callback:
+            callback("Live panorama failed: No frames could be read")
+        return None
+
+    cv2.imwrite(output_file, panorama)
+    if callback:
+        callback(
+            f"Live panorama created from {stats['keyframes']} keyframes "
+            f"({stats['lost']} frames lost, {stats['reacquired']} reacquisitions, "
+            f"{stats['rejected']} rejected, {stats['dropped']} dropped): "
+            f"mean latency {stats['mean_latency'] * 1000:.1f} ms, "
+            f"p95 {stats['p95_latency'] * 1000:.1f} ms, "
+            f"{stats['on_target'] * 100:.0f}% within "
+            f"{settings['latency_target'] * 1000:.0f} ms"
+        )
+    if interim_callback:
+        interim_callback(panorama, stats["frames"], stats["frames"])
+    return panorama
+
+
 def stitch_panorama(
     frames_dir, output_path, settings=None, callback=None, interim_callback=None
 ):